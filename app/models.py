@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, func
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, Text, func
 from sqlalchemy.orm import declarative_base
 from pydantic import BaseModel
 
@@ -33,8 +33,18 @@ class Dictionary(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     word = Column(String(50), unique=True, index=True)
+    # normalize(word): every spelling variant of a word shares this key
+    word_norm = Column(String(50), index=True)
     description = Column(Text)
 
+class DictionaryChange(Base):
+    __tablename__ = "dictionary_changes"
+
+    seq = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    op = Column(String(6), nullable=False)
+    word = Column(String(50), nullable=False)
+    timestamp = Column(DateTime, server_default=func.now())
+
 class WordCreate(BaseModel):
     word: str
     description: str
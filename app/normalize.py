@@ -0,0 +1,13 @@
+import unicodedata
+
+
+def normalize(text, fold_accents=True):
+    # Index key for a dictionary word: NFKC, casefolded and, by default,
+    # stripped of combining marks, so "Über", "über" and "uber" share a key.
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKC", text).casefold()
+    if fold_accents:
+        text = "".join(char for char in unicodedata.normalize("NFD", text) if not unicodedata.combining(char))
+        text = unicodedata.normalize("NFC", text)
+    return text
@@ -1,16 +1,45 @@
+import json
 import random
 from datetime import datetime, timedelta
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Response, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from app.db import get_db
+from app.db import get_db, SessionLocal
+from app.sync import record_changes
+from app.normalize import normalize
 from app.models import User, LoginRequest, Dictionary, UserCreate, AddUser, WordCreate, WordDelete
 from sqlalchemy.orm import Session
-from typing import List
+from itertools import islice
+from typing import List, Optional
 
 router = APIRouter()
 
+# Default and largest page for the list endpoints; ?stream=1 returns every
+# row after the cursor as NDJSON instead
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK = 1000
+# Rows per multi-row INSERT / DELETE ... IN statement in the batch endpoints
+BATCH_CHUNK = 500
+
+
+def _ndjson_rows(model, after_id, columns):
+    # The request session is closed before the body is sent, so the stream
+    # uses its own and reads through a server-side cursor in chunks
+    db = SessionLocal()
+    try:
+        query = (db.query(*columns).filter(model.id > after_id).order_by(model.id)
+                 .execution_options(stream_results=True).yield_per(STREAM_CHUNK))
+        for row in query:
+            yield json.dumps(row._asdict(), default=str) + "\n"
+    finally:
+        db.close()
+
+
+def ndjson_response(model, after_id, columns):
+    return StreamingResponse(_ndjson_rows(model, after_id, columns), media_type="application/x-ndjson")
+
 security = HTTPBasic()
 
 ########## USER FUNCTIONS
@@ -31,7 +60,7 @@ def login(request_body: LoginRequest, response: Response, db: Session = Depends(
 #works
 @router.get("/words/{word}")
 def get_word_by_name(word: str, db: Session = Depends(get_db)):
-    result = db.query(Dictionary).filter_by(word=word).all()
+    result = db.query(Dictionary).filter(Dictionary.word_norm == normalize(word)).all()
     return result
 #works
 @router.get("/users/{username}")
@@ -44,8 +73,12 @@ def get_user(username: str, db: Session = Depends(get_db)):
 ## ADMIN ENDPOINTS
 #works
 @router.get("/all_users/")
-def read_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
+def read_users(after_id: int = 0, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+               stream: bool = False, db: Session = Depends(get_db)):
+    # Keyset pagination: pass the last id of the previous page as after_id
+    if stream:
+        return ndjson_response(User, after_id, User.__table__.columns)
+    users = db.query(User).filter(User.id > after_id).order_by(User.id).limit(limit).all()
     return {"users": users}
 
 #works
@@ -67,28 +100,45 @@ def create_user(request_body: AddUser, db: Session = Depends(get_db)):
 #works
 @router.delete("/delete_users")
 def delete_users(usernames: List[str], db: Session = Depends(get_db)):
+    # IN matches under the column's collation, which may ignore case and
+    # accents, so the stored usernames are reported as deleted and a
+    # requested name only counts as missing if nothing equivalent was found
     deleted_users = []
-    for username in usernames:
-        user = db.query(User).filter(User.username == username).first()
-        if user:
-            db.delete(user)
-            deleted_users.append(username)
+    usernames = list(dict.fromkeys(usernames))
+    for start in range(0, len(usernames), BATCH_CHUNK):
+        chunk = usernames[start:start + BATCH_CHUNK]
+        found = [name for (name,) in db.query(User.username).filter(User.username.in_(chunk))]
+        if found:
+            db.query(User).filter(User.username.in_(found)).delete(synchronize_session=False)
+        deleted_users.extend(found)
     db.commit()
-    return {"deleted_users": deleted_users}
+    deleted = {normalize(name) for name in deleted_users}
+    return {"deleted_users": deleted_users,
+            "missing_users": [name for name in usernames if normalize(name) not in deleted]}
 
 @router.post("/users/create/batch/")
 def create_users(users: List[UserCreate], db : Session = Depends(get_db)):
-    added_users = []
-    for user in users:
-        if db.query(User).filter(User.username == user['username']).first():
-            pass
-        # Create a new user and add it to the database session
-        new_user = User(username=user['username'], password=user['password'])
-        db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
-    # Return a message indicating the users were added successfully
-    return {"message": f"{len(added_users)} Users added successfully"}
+    # Existing usernames are looked up and the new users inserted one chunk
+    # at a time, all in a single transaction
+    added_users, skipped_users = [], []
+    seen = set()
+    for start in range(0, len(users), BATCH_CHUNK):
+        chunk = users[start:start + BATCH_CHUNK]
+        names = [user.username for user in chunk]
+        seen.update(name for (name,) in db.query(User.username).filter(User.username.in_(names)))
+        rows = []
+        for user in chunk:
+            if user.username in seen:
+                skipped_users.append(user.username)
+                continue
+            seen.add(user.username)
+            rows.append({"username": user.username, "password": user.password, "name": user.full_name})
+        if rows:
+            db.execute(User.__table__.insert(), rows)
+            added_users.extend(row["username"] for row in rows)
+    db.commit()
+    return {"message": f"{len(added_users)} Users added successfully", "added_users": added_users,
+            "skipped_users": skipped_users}
 
 #working
 @router.post("/add_dictionary")
@@ -99,8 +149,10 @@ def create_word(request_body: WordCreate, request: Request, db: Session = Depend
         raise HTTPException(status_code=400, detail="Word already exists")
 
     # Create a new word in the database
-    new_word = Dictionary(word=request_body.word, description=request_body.description, id=random.randint(1, 9999999))
+    new_word = Dictionary(word=request_body.word, word_norm=normalize(request_body.word),
+                          description=request_body.description, id=random.randint(1, 9999999))
     db.add(new_word)
+    record_changes(db, "insert", [request_body.word])
     db.commit()
     db.refresh(new_word)
     request.app.state.trie.insert(request_body.word)
@@ -110,23 +162,43 @@ def create_word(request_body: WordCreate, request: Request, db: Session = Depend
 #working
 @router.delete("/delete_dictionary")
 def delete_word(request_body: List[str], request: Request, db: Session = Depends(get_db)):
-    # Check if the word already exists in the database
+    # One SELECT and one DELETE ... WHERE word IN (...) per chunk. The
+    # change feed and the trie get the stored spellings, which under a
+    # case- or accent-insensitive collation may differ from the request's.
     deleted_words = []
-    for word in request_body:
-        db_word = db.query(Dictionary).filter(Dictionary.word == word).first()
-        if db_word:
-            db.delete(db_word)
-            deleted_words.append(word)
+    words = list(dict.fromkeys(request_body))
+    for start in range(0, len(words), BATCH_CHUNK):
+        chunk = words[start:start + BATCH_CHUNK]
+        found = [word for (word,) in db.query(Dictionary.word).filter(Dictionary.word.in_(chunk))]
+        if found:
+            db.query(Dictionary).filter(Dictionary.word.in_(found)).delete(synchronize_session=False)
+        deleted_words.extend(found)
+    record_changes(db, "delete", deleted_words)
+    db.commit()
+
+    request.app.state.trie.delete_many(deleted_words)
 
-    return {"message": f"{deleted_words} deleted successfully"}
+    deleted = {normalize(word) for word in deleted_words}
+    return {"message": f"{deleted_words} deleted successfully", "deleted_words": deleted_words,
+            "missing_words": [word for word in words if normalize(word) not in deleted]}
 
 #working
 @router.get("/all_words")
-def read_words(db: Session = Depends(get_db)):
-    words = db.query(Dictionary).all()
+def read_words(after_id: int = 0, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+               stream: bool = False, db: Session = Depends(get_db)):
+    if stream:
+        return ndjson_response(Dictionary, after_id, Dictionary.__table__.columns)
+    words = db.query(Dictionary).filter(Dictionary.id > after_id).order_by(Dictionary.id).limit(limit).all()
     return {"words": words}
 
 @router.get("/search")
-async def search(word: str, request: Request) -> List[str]:
-    results = request.app.state.trie.search(word)
-    return results[:10]
\ No newline at end of file
+async def search(word: str, request: Request, limit: int = Query(10, ge=1, le=100),
+                 fuzzy: bool = False, distance: int = Query(1, ge=0, le=2),
+                 after: Optional[str] = None) -> List[str]:
+    if fuzzy:
+        return request.app.state.trie.fuzzy(word, distance, limit)
+    # With a cursor (?after=<last word of the previous page>, empty for the
+    # first page) results come in lexicographic order instead of ranked
+    if after is not None:
+        return list(islice(request.app.state.trie.iter_prefix(word, after), limit))
+    return request.app.state.trie.complete(word, limit)
\ No newline at end of file
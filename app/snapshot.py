@@ -0,0 +1,49 @@
+import os
+
+from sqlalchemy import func
+
+from app.models import Dictionary
+from app.sync import latest_seq
+from app.trie import Trie
+
+SNAPSHOT_PATH = os.environ.get("TRIE_SNAPSHOT_PATH", "trie.snapshot")
+
+
+def dictionary_fingerprint(db):
+    # Cheap aggregate over the dictionary table; any insert, delete or
+    # rename changes at least one of the three values. CRC32() is MySQL's,
+    # so on other databases there is no fingerprint and load_trie always
+    # rebuilds.
+    if db.get_bind().dialect.name not in ("mysql", "mariadb"):
+        return None
+    count, max_id, checksum = db.query(
+        func.count(Dictionary.id),
+        func.max(Dictionary.id),
+        func.sum(func.crc32(Dictionary.word)),
+    ).one()
+    return f"{count}:{max_id}:{checksum}"
+
+
+def load_trie(db, path=SNAPSHOT_PATH):
+    # Opens the snapshot if it was built from the current table contents,
+    # otherwise rebuilds it from the database and writes a new one. Also
+    # returns the change-feed position read before the table was, so
+    # replaying from it cannot miss a concurrent write.
+    seq = latest_seq(db)
+    fingerprint = dictionary_fingerprint(db)
+    if fingerprint is not None:
+        try:
+            trie, meta = Trie.open(path)
+        except (OSError, ValueError):
+            pass
+        else:
+            if meta.get("fingerprint") == fingerprint:
+                return trie, seq
+            # Stale: unmap it before the rebuild replaces the file
+            trie.close()
+
+    words = db.query(Dictionary.word).all()
+    trie = Trie.build(sorted(word for (word,) in words))
+    trie.save(path, {"fingerprint": fingerprint})
+    # Reopen through mmap so the pages are shared with the other workers
+    return Trie.open(path)[0], seq
@@ -0,0 +1,105 @@
+import asyncio
+import os
+import time
+
+from sqlalchemy import func, or_
+from starlette.concurrency import run_in_threadpool
+
+from app.db import SessionLocal
+from app.models import DictionaryChange
+
+POLL_INTERVAL = float(os.environ.get("TRIE_SYNC_INTERVAL", "2"))
+# seq is handed out at insert time but transactions can commit out of
+# order, so a seq skipped over may still show up. Such gaps are looked up
+# again on every poll for GAP_TIMEOUT seconds; one still missing by then
+# belonged to a rolled-back transaction.
+GAP_TIMEOUT = float(os.environ.get("TRIE_SYNC_GAP_TIMEOUT", "60"))
+BATCH_SIZE = 1000
+
+
+def record_changes(db, op, words):
+    # Added to the caller's session so the feed commits with the write itself
+    db.add_all([DictionaryChange(op=op, word=word) for word in words])
+
+
+def latest_seq(db):
+    return db.query(func.max(DictionaryChange.seq)).scalar() or 0
+
+
+def fetch_changes(after, missing=()):
+    # Changes after the cursor plus any of the missing seqs that have
+    # committed since
+    condition = DictionaryChange.seq > after
+    if missing:
+        condition = or_(condition, DictionaryChange.seq.in_(list(missing)))
+    db = SessionLocal()
+    try:
+        return (
+            db.query(DictionaryChange.seq, DictionaryChange.op, DictionaryChange.word)
+            .filter(condition)
+            .order_by(DictionaryChange.seq)
+            .limit(BATCH_SIZE)
+            .all()
+        )
+    finally:
+        db.close()
+
+
+def missing_seqs(upto):
+    # seqs among the last BATCH_SIZE up to the cursor that are not in the
+    # feed (yet): at startup the cursor is read before writes still in
+    # flight have committed
+    db = SessionLocal()
+    try:
+        present = {seq for (seq,) in db.query(DictionaryChange.seq)
+                   .filter(DictionaryChange.seq > upto - BATCH_SIZE, DictionaryChange.seq <= upto)}
+    finally:
+        db.close()
+    return [seq for seq in range(max(1, upto - BATCH_SIZE + 1), upto + 1) if seq not in present]
+
+
+def apply_changes(trie, changes):
+    # Replaying is idempotent: inserting a present word or deleting a missing
+    # one is a no-op, so changes this worker already applied are harmless.
+    for _, op, word in changes:
+        if op == "insert":
+            trie.insert(word)
+        elif op == "delete":
+            trie.delete(word)
+
+
+def advance(seq, gaps, changes, now):
+    # Returns the new cursor; gaps maps each seq skipped over to when it
+    # was first found missing and is updated in place
+    for change in changes:
+        gaps.pop(change.seq, None)
+        if change.seq > seq:
+            gaps.update((missing, now) for missing in range(seq + 1, change.seq))
+            seq = change.seq
+    return seq
+
+
+async def follow_changes(app, seq):
+    # Polls the change feed and applies it to app.state.trie, so every worker
+    # converges within roughly POLL_INTERVAL of a write in any other worker.
+    try:
+        gaps = dict.fromkeys(await run_in_threadpool(missing_seqs, seq), time.monotonic())
+    except Exception as e:
+        print(f"trie sync could not check for gaps before seq {seq}: {e}")
+        gaps = {}
+    while True:
+        await asyncio.sleep(POLL_INTERVAL)
+        try:
+            now = time.monotonic()
+            for missing, since in list(gaps.items()):
+                if now - since > GAP_TIMEOUT:
+                    del gaps[missing]
+            changes = await run_in_threadpool(fetch_changes, seq, list(gaps))
+            while changes:
+                apply_changes(app.state.trie, changes)
+                seq = advance(seq, gaps, changes, now)
+                if len(changes) < BATCH_SIZE:
+                    break
+                changes = await run_in_threadpool(fetch_changes, seq)
+        except Exception as e:
+            print(f"trie sync failed at seq {seq}: {e}")
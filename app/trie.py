@@ -1,45 +1,474 @@
-class TrieNode:
-    def __init__(self):
-        self.children = {}
-        self.is_end_of_word = False
+import heapq
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+
+from app.normalize import normalize
+
+# Snapshot layout: header, JSON metadata, then one section per node array
+# and a JSON map of surface forms, each padded to 8 bytes. Bump
+# SNAPSHOT_VERSION whenever the layout changes.
+SNAPSHOT_MAGIC = b"EMCTRIE\0"
+SNAPSHOT_VERSION = 2
+_HEADER = struct.Struct("<8sHHIQQ")
 
 
 class Trie:
+    # Nodes live in parallel arrays instead of one object + dict per char.
+    # Each node stores its label (code point), its first child and its next
+    # sibling; siblings are kept sorted by label so lookups can stop early.
+    # _score holds the score of the word ending at a node and _best an upper
+    # bound on any score in the node's subtree, which lets complete() search
+    # best-first and stop after k words. Slots of pruned nodes are kept on a
+    # free list and reused by later inserts.
+    # Words are stored under their normalize() key. _surfaces maps a key to
+    # the original spellings indexed under it, for keys whose only spelling
+    # is not the key itself; results are always returned as those spellings.
     def __init__(self):
-        self.root = TrieNode()
-
-    def insert(self, word):
-        current = self.root
-        for char in word:
-            node = current.children.get(char)
-            if node is None:
-                node = TrieNode()
-                current.children[char] = node
-            current = node
-        current.is_end_of_word = True
+        self._label = array("I", [0])
+        self._child = array("i", [-1])
+        self._sibling = array("i", [-1])
+        self._terminal = bytearray(1)
+        self._score = array("i", [0])
+        self._best = array("i", [0])
+        self._surfaces = {}
+        self._free = []
+        self._lock = threading.Lock()
+        self._mmap = None
+
+    _FIELDS = (
+        ("_label", "I"),
+        ("_child", "i"),
+        ("_sibling", "i"),
+        ("_score", "i"),
+        ("_best", "i"),
+        ("_terminal", "B"),
+    )
+
+    @classmethod
+    def build(cls, words, scores=None):
+        # Bulk constructor. Keys are added in ascending order, so new nodes
+        # are always appended after the last sibling and nothing has to be
+        # searched. `scores` optionally maps words to their ranking score.
+        trie = cls()
+        forms = {}
+        for word in words:
+            forms.setdefault(normalize(word), set()).add(word)
+        path = [0]
+        prev = ""
+        for word in sorted(forms):
+            spellings = sorted(forms[word])
+            if spellings != [word]:
+                trie._surfaces[word] = spellings
+            common = 0
+            for a, b in zip(prev, word):
+                if a != b:
+                    break
+                common += 1
+            last = path[common + 1] if len(path) > common + 1 else -1
+            del path[common + 1:]
+            node = path[-1]
+            for char in word[common:]:
+                new = trie._add_node(ord(char), -1)
+                if last == -1:
+                    trie._child[node] = new
+                else:
+                    trie._sibling[last] = new
+                last = -1
+                path.append(new)
+                node = new
+            trie._terminal[node] = 1
+            if scores:
+                trie._set_score(path, max(scores.get(spelling, 0) for spelling in spellings))
+            prev = word
+        return trie
+
+    def save(self, path, meta=None):
+        # Written to a temporary file and renamed into place, so workers that
+        # still have the previous snapshot mapped keep reading a whole file.
+        meta_bytes = json.dumps(meta or {}).encode()
+        surfaces_bytes = json.dumps(self._surfaces).encode()
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, sys.byteorder == "big",
+                                 len(meta_bytes), len(self._label), len(surfaces_bytes)))
+            f.write(meta_bytes)
+            for name, _ in self._FIELDS:
+                _pad(f)
+                f.write(memoryview(getattr(self, name)).cast("B"))
+            _pad(f)
+            f.write(surfaces_bytes)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path):
+        # Maps a snapshot read-only. The node arrays become memoryviews over
+        # the mapping, so every worker opening the same file shares its pages.
+        # Returns (trie, meta) and raises ValueError for unusable files.
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, big_endian, meta_len, count, surfaces_len = _HEADER.unpack_from(mm)
+        except struct.error:
+            raise ValueError(f"{path} is not a trie snapshot")
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path} is not a version {SNAPSHOT_VERSION} trie snapshot")
+        if big_endian != (sys.byteorder == "big"):
+            raise ValueError(f"{path} was written with a different byte order")
+        offset = _HEADER.size
+        meta = json.loads(mm[offset:offset + meta_len])
+        offset += meta_len
+        trie = cls.__new__(cls)
+        view = memoryview(mm)
+        for name, code in cls._FIELDS:
+            offset += -offset % 8
+            size = count * array(code).itemsize
+            if offset + size > len(mm):
+                raise ValueError(f"{path} is truncated")
+            setattr(trie, name, view[offset:offset + size].cast(code))
+            offset += size
+        offset += -offset % 8
+        if offset + surfaces_len > len(mm):
+            raise ValueError(f"{path} is truncated")
+        # The surface map is small next to the node arrays and is loaded
+        # onto the heap rather than shared
+        trie._surfaces = json.loads(mm[offset:offset + surfaces_len])
+        trie._free = []
+        trie._lock = threading.Lock()
+        trie._mmap = mm
+        return trie, meta
+
+    def _thaw(self):
+        # Copy-on-write: the first mutation of a mapped trie copies its
+        # arrays onto the heap of this worker.
+        if self._mmap is None:
+            return
+        for name, code in self._FIELDS:
+            data = getattr(self, name).tobytes()
+            setattr(self, name, bytearray(data) if code == "B" else array(code, data))
+        self._mmap = None
+
+    def close(self):
+        # Unmaps a snapshot opened with open(). The trie cannot be used
+        # afterwards; a trie on the heap has nothing to release.
+        if self._mmap is None:
+            return
+        for name, _ in self._FIELDS:
+            getattr(self, name).release()
+        self._mmap.close()
+        self._mmap = None
+
+    def __len__(self):
+        return sum(self._terminal)
+
+    def _add_node(self, code, sibling):
+        if self._free:
+            node = self._free.pop()
+            self._label[node] = code
+            self._child[node] = -1
+            self._sibling[node] = sibling
+            return node
+        self._label.append(code)
+        self._child.append(-1)
+        self._sibling.append(sibling)
+        self._terminal.append(0)
+        self._score.append(0)
+        self._best.append(0)
+        return len(self._label) - 1
+
+    def _set_score(self, path, score):
+        # _best only ever grows here, so after a score decrease it stays a
+        # valid (if looser) upper bound for the subtree.
+        self._score[path[-1]] = score
+        best = self._best
+        for node in path:
+            if best[node] < score:
+                best[node] = score
+
+    def _walk(self, prefix):
+        label, first, sibling = self._label, self._child, self._sibling
+        node = 0
+        for char in prefix:
+            code = ord(char)
+            node = first[node]
+            while node != -1 and label[node] < code:
+                node = sibling[node]
+            if node == -1 or label[node] != code:
+                return -1
+        return node
+
+    def _forms(self, key):
+        return self._surfaces.get(key) or [key]
+
+    def _expand(self, keys, k=None):
+        words = []
+        for key in keys:
+            words.extend(self._forms(key))
+        return words[:k]
+
+    def insert(self, word, score=0):
+        key = normalize(word)
+        with self._lock:
+            self._thaw()
+            node = 0
+            path = [node]
+            for char in key:
+                code = ord(char)
+                prev, child = -1, self._child[node]
+                while child != -1 and self._label[child] < code:
+                    prev, child = child, self._sibling[child]
+                if child == -1 or self._label[child] != code:
+                    new = self._add_node(code, child)
+                    if prev == -1:
+                        self._child[node] = new
+                    else:
+                        self._sibling[prev] = new
+                    child = new
+                node = child
+                path.append(node)
+            forms = self._forms(key) if self._terminal[node] else []
+            if word not in forms:
+                forms = sorted(forms + [word])
+            if forms == [key]:
+                self._surfaces.pop(key, None)
+            else:
+                self._surfaces[key] = forms
+            self._terminal[node] = 1
+            self._set_score(path, score)
+
+    def delete(self, word):
+        # Removes one spelling; once a key has none left it is unmarked and
+        # the branch of nodes that no longer lead to any word is pruned.
+        # Returns False if the word was not in the trie.
+        with self._lock:
+            return self._delete(word)
+
+    def delete_many(self, words):
+        # Same as delete for each word under a single lock acquisition;
+        # returns the words that were present
+        with self._lock:
+            return [word for word in words if self._delete(word)]
+
+    def _delete(self, word):
+        key = normalize(word)
+        node = self._walk(key)
+        if node == -1 or not self._terminal[node]:
+            return False
+        forms = self._forms(key)
+        if word not in forms:
+            return False
+        forms = [form for form in forms if form != word]
+        if forms and forms != [key]:
+            self._surfaces[key] = forms
+        else:
+            self._surfaces.pop(key, None)
+        if forms:
+            return True
+        self._thaw()
+        path = [0]
+        for char in key:
+            path.append(self._walk_one(path[-1], ord(char)))
+        self._terminal[node] = 0
+        self._score[node] = 0
+        while len(path) > 1 and self._child[node] == -1 and not self._terminal[node]:
+            path.pop()
+            self._unlink(path[-1], node)
+            node = path[-1]
+        for node in reversed(path):
+            self._best[node] = self._subtree_best(node)
+        return True
+
+    def _walk_one(self, node, code):
+        child = self._child[node]
+        while self._label[child] != code:
+            child = self._sibling[child]
+        return child
+
+    def _unlink(self, parent, node):
+        prev, child = -1, self._child[parent]
+        while child != node:
+            prev, child = child, self._sibling[child]
+        if prev == -1:
+            self._child[parent] = self._sibling[node]
+        else:
+            self._sibling[prev] = self._sibling[node]
+        self._terminal[node] = 0
+        self._score[node] = 0
+        self._best[node] = 0
+        self._free.append(node)
+
+    def _subtree_best(self, node):
+        best = self._score[node] if self._terminal[node] else 0
+        child = self._child[node]
+        while child != -1:
+            best = max(best, self._best[child])
+            child = self._sibling[child]
+        return best
 
     def search(self, word):
-        current = self.root
-        for char in word:
-            node = current.children.get(char)
-            if node is None:
-                return False
-            current = node
-        return current.is_end_of_word
+        node = self._walk(normalize(word))
+        return node != -1 and self._terminal[node] == 1
 
     def starts_with(self, prefix):
-        current = self.root
+        return list(self.iter_prefix(prefix))
+
+    def iter_prefix(self, prefix, after=None):
+        # Lazily yields the words starting with `prefix`, ordered by key and
+        # then spelling. With `after`, enumeration resumes just past that
+        # word (which need not be in the trie), so pages can be fetched by
+        # cursor.
+        prefix = normalize(prefix)
+        if after is not None:
+            after_key = normalize(after)
+            if after_key.startswith(prefix) and self.search(after_key):
+                yield from (form for form in self._forms(after_key) if form > after)
+            after = after_key
+        for key in self._iter_keys(prefix, after):
+            yield from self._forms(key)
+
+    def _iter_keys(self, prefix, after=None):
+        # Iterative, so deep words cannot hit the recursion limit
+        start = self._walk(prefix)
+        if start == -1:
+            return
+        if after is not None and not after.startswith(prefix):
+            if after > prefix:
+                return
+            after = None
+        label, first, sibling, terminal = self._label, self._child, self._sibling, self._terminal
+        path = [start]
+        chars = [prefix]
+        if after is None:
+            if terminal[start]:
+                yield prefix
+            node = first[start]
+        else:
+            # Descend along the cursor; `node` ends up as the first node to
+            # visit, or -1 to continue with the next sibling of path[-1].
+            parent = start
+            for char in after[len(prefix):]:
+                code = ord(char)
+                node = first[parent]
+                while node != -1 and label[node] < code:
+                    node = sibling[node]
+                if node == -1 or label[node] != code:
+                    break
+                path.append(node)
+                chars.append(char)
+                parent = node
+            else:
+                node = first[parent]
+        while True:
+            if node != -1:
+                path.append(node)
+                chars.append(chr(label[node]))
+                if terminal[node]:
+                    yield "".join(chars)
+                node = first[node]
+            elif len(path) > 1:
+                node = sibling[path.pop()]
+                chars.pop()
+            else:
+                return
+
+    def complete(self, prefix, k=10):
+        return self._expand(self._complete_keys(normalize(prefix), k), k)
+
+    def _complete_keys(self, prefix, k):
+        # Best-first search ordered by (score desc, length, word). A node is
+        # queued with its subtree bound, so no word below it can rank ahead
+        # of it and the search can stop as soon as k words have been popped.
+        node = self._walk(prefix)
+        if node == -1 or k <= 0:
+            return []
+        label, first, sibling = self._label, self._child, self._sibling
+        terminal, score, best = self._terminal, self._score, self._best
+        heap = [(-best[node], len(prefix), prefix, node, False)]
         words = []
-        for char in prefix:
-            node = current.children.get(char)
-            if node is None:
-                return words
-            current = node
-        self._dfs(current, prefix, words)
+        while heap:
+            _, length, word, node, is_word = heapq.heappop(heap)
+            if is_word:
+                words.append(word)
+                if len(words) == k:
+                    break
+                continue
+            if terminal[node]:
+                heapq.heappush(heap, (-score[node], length, word, node, True))
+            child = first[node]
+            while child != -1:
+                heapq.heappush(heap, (-best[child], length + 1, word + chr(label[child]), child, False))
+                child = sibling[child]
         return words
 
-    def _dfs(self, node, prefix, words):
-        if node.is_end_of_word:
-            words.append(prefix)
-        for char, child_node in node.children.items():
-            self._dfs(child_node, prefix + char, words)
+    def fuzzy(self, word, max_distance=2, k=10):
+        # Results are ranked by distance, then score, then length. The search
+        # widens one edit at a time: once k words are found within some
+        # distance, nothing further away could rank ahead of them, which
+        # saves the much larger walk for the next distance.
+        word = normalize(word)
+        matches = []
+        for distance in range(min(max_distance, 1), max_distance + 1):
+            matches = self._fuzzy_matches(word, distance)
+            if len(matches) >= k:
+                break
+        return self._expand((text for _, _, _, text in heapq.nsmallest(k, matches)), k)
+
+    def _fuzzy_matches(self, word, max_distance):
+        # Walks the trie through a bit-parallel Levenshtein automaton (one
+        # bitmask of matched query prefixes per allowed error count, plus
+        # adjacent transpositions, so "recieve" is one edit from "receive").
+        # A subtree is skipped as soon as no state survives.
+        n = len(word)
+        full = (1 << (n + 1)) - 1
+        accept = 1 << n
+        masks = {}
+        for i, char in enumerate(word, 1):
+            masks[char] = masks.get(char, 0) | (1 << i)
+        label, first, sibling = self._label, self._child, self._sibling
+        terminal, score = self._terminal, self._score
+        errors = range(1, max_distance + 1)
+
+        matches = []
+        start = tuple((1 << (e + 1)) - 1 & full for e in range(max_distance + 1))
+        if terminal[0] and start[-1] & accept:
+            matches.append((_distance(start, accept), -score[0], 0, ""))
+        stack = []
+        child = first[0]
+        while child != -1:
+            stack.append((child, "", start, None, 0))
+            child = sibling[child]
+        while stack:
+            node, prefix, state, prev_state, prev_mask = stack.pop()
+            char = chr(label[node])
+            mask = masks.get(char, 0)
+            new = [(state[0] << 1) & mask]
+            for e in errors:
+                below = state[e - 1]
+                bits = (state[e] << 1) & mask | below | below << 1 | new[e - 1] << 1
+                if prev_state is not None:
+                    bits |= (prev_state[e - 1] << 2) & (mask << 1) & prev_mask
+                new.append(bits & full)
+            if not new[-1]:
+                continue
+            text = prefix + char
+            if terminal[node] and new[-1] & accept:
+                matches.append((_distance(new, accept), -score[node], len(text), text))
+            child = first[node]
+            while child != -1:
+                stack.append((child, text, new, state, mask))
+                child = sibling[child]
+        return matches
+
+
+def _distance(state, accept):
+    for errors, bits in enumerate(state):
+        if bits & accept:
+            return errors
+
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
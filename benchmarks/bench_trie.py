@@ -0,0 +1,180 @@
+"""Trie benchmarks: build time, memory per word, exact lookup, top-k prefix
+completion for 1-5 character prefixes and fuzzy lookup.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_trie --output results.json
+    python -m benchmarks.bench_trie --compare benchmarks/baseline.json
+
+Every query is run --passes times and its fastest time is kept. Results
+are written as JSON, unrounded. With --compare, every timing is
+printed next to the baseline and the exit status is 1 if any of them
+regressed by more than --threshold and by more than its noise floor.
+Regenerate benchmarks/baseline.json whenever the trie changes on purpose.
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from app.trie import Trie
+from benchmarks.corpora import synthetic_words, testdata_words, typo, wordlist_words
+
+DEFAULT_SIZES = "100000,1000000"
+# Smallest slowdown, by metric unit, that can count as a regression; below
+# these, timer resolution and scheduling noise dominate the ratio
+NOISE_FLOORS = {"_s": 0.005, "_us": 2.0, "_ns": 100.0}
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return {
+        "p50_us": samples[len(samples) // 2] * 1e6,
+        "p99_us": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1e6,
+    }
+
+
+def timed(fn, queries, passes):
+    # Each query is timed once per pass and keeps its fastest time, so a
+    # pause from the scheduler or the GC does not land in the percentiles
+    samples = [float("inf")] * len(queries)
+    for _ in range(passes):
+        for i, query in enumerate(queries):
+            start = time.perf_counter()
+            fn(query)
+            samples[i] = min(samples[i], time.perf_counter() - start)
+    return percentiles(samples)
+
+
+def bench_corpus(words, args):
+    rnd = random.Random(args.seed)
+    result = {"words": len(words)}
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    trie = Trie.build(words)
+    result["build_s"] = time.perf_counter() - start
+    result["bytes_per_word"] = tracemalloc.get_traced_memory()[0] / len(words)
+    tracemalloc.stop()
+
+    sample = [rnd.choice(words) for _ in range(args.queries)]
+    misses = [word + "qz" for word in sample]
+    elapsed = float("inf")
+    for _ in range(args.passes):
+        start = time.perf_counter()
+        for word in sample + misses:
+            trie.search(word)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    result["search_ns"] = elapsed / (2 * len(sample)) * 1e9
+
+    for length in range(1, 6):
+        prefixes = [word[:length] for word in sample if len(word) >= length]
+        result[f"complete_{length}"] = timed(lambda prefix: trie.complete(prefix, 10), prefixes,
+                                              args.passes)
+
+    for distance in args.fuzzy_distances:
+        typos = [typo(word, rnd) for word in sample[:args.fuzzy_queries]]
+        result[f"fuzzy_d{distance}"] = timed(lambda word: trie.fuzzy(word, distance, 10), typos, args.passes)
+    return result
+
+
+def corpora(sizes):
+    yield "testdata", testdata_words()
+    yield "wordlist", wordlist_words()
+    for size in sizes:
+        yield f"synthetic_{size}", synthetic_words(size)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(result, prefix=""):
+    for key, value in result.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        else:
+            yield f"{prefix}{key}", value
+
+
+def noise_floor(metric):
+    return next((floor for unit, floor in NOISE_FLOORS.items() if metric.endswith(unit)), 0.0)
+
+
+def compare(current, baseline, threshold):
+    regressed = False
+    for name, result in current["results"].items():
+        old = dict(flatten(baseline["results"].get(name, {})))
+        for metric, value in flatten(result):
+            if metric == "words" or not old.get(metric):
+                continue
+            ratio = value / old[metric]
+            flag = ""
+            if ratio > threshold:
+                if value - old[metric] > noise_floor(metric):
+                    flag = "  REGRESSION"
+                    regressed = True
+                else:
+                    flag = "  (noise)"
+            print(f"{name:20} {metric:22} {old[metric]:>12.4g} {value:>12.4g} {ratio:6.2f}x{flag}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark app.trie.Trie")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help="comma-separated synthetic corpus sizes (default: %(default)s)")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--fuzzy-queries", type=int, default=200)
+    parser.add_argument("--fuzzy-distances", default="1",
+                        type=lambda value: [int(d) for d in value.split(",") if d])
+    parser.add_argument("--passes", type=int, default=3,
+                        help="times each query is run; the fastest counts (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="slowdown ratio counted as a regression (default: %(default)s)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "queries": args.queries,
+            "passes": args.passes,
+            "seed": args.seed,
+        },
+        "results": {},
+    }
+    for name, words in corpora(sizes):
+        print(f"benchmarking {name} ({len(words)} words)", file=sys.stderr)
+        report["results"][name] = bench_corpus(words, args)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import ast
+import os
+import random
+from collections import defaultdict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTDATA_PATH = os.path.join(ROOT, "testdata.txt")
+WORDLIST_PATH = os.path.join(ROOT, "emcbackend", "src", "fuck.txt")
+
+
+def testdata_words():
+    # "word: description" per line
+    with open(TESTDATA_PATH) as f:
+        return sorted({line.split(":", 1)[0].strip() for line in f if ":" in line})
+
+
+def wordlist_words():
+    # A Python dict literal of word -> description
+    with open(WORDLIST_PATH) as f:
+        return sorted(ast.literal_eval(f.read()))
+
+
+def synthetic_words(count, seed=1, order=2):
+    # Order-2 character Markov chain trained on the word list. Unlike
+    # independent random letters it keeps the prefix structure of real
+    # words, which is what trie memory and fuzzy walks are sensitive to.
+    model = defaultdict(list)
+    for word in wordlist_words():
+        word = "^" * order + word.lower() + "$"
+        for i in range(order, len(word)):
+            model[word[i - order:i]].append(word[i])
+    rnd = random.Random(seed)
+    words = set()
+    while len(words) < count:
+        context, word = "^" * order, ""
+        while len(word) < 24:
+            char = rnd.choice(model[context])
+            if char == "$":
+                break
+            word += char
+            context = (context + char)[-order:]
+        if len(word) > 1:
+            words.add(word)
+    return sorted(words)
+
+
+def typo(word, rnd, alphabet="abcdefghijklmnopqrstuvwxyz"):
+    # One substitution, deletion, insertion or adjacent transposition
+    i = rnd.randrange(len(word))
+    kind = rnd.randrange(4)
+    if kind == 0:
+        return word[:i] + rnd.choice(alphabet) + word[i + 1:]
+    if kind == 1 and len(word) > 1:
+        return word[:i] + word[i + 1:]
+    if kind == 2:
+        return word[:i] + rnd.choice(alphabet) + word[i:]
+    if i + 1 < len(word):
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word + rnd.choice(alphabet)
@@ -0,0 +1,107 @@
+from collections import defaultdict
+
+from sqlalchemy import select
+
+from app.models import FirstLayer, CoreLayer
+from app.trie import Trie
+
+# Layer name -> (table, primary key column)
+LAYERS = {
+    "core": (CoreLayer, CoreLayer.id),
+    "first": (FirstLayer, FirstLayer.pre_id),
+}
+FETCH_CHUNK = 1000
+
+
+class LayerIndex:
+    # Prefix index over one layer's public words. Private words are left out
+    # entirely: the backend has no authentication yet, so there is no way to
+    # tell who is asking for them.
+    def __init__(self):
+        self.public = Trie()
+        self._rows = {}
+        self._ids = defaultdict(set)
+
+    @classmethod
+    def load(cls, rows):
+        # Bulk constructor from (id, word, is_private) rows
+        index = cls()
+        for row_id, word, is_private in rows:
+            index._track(row_id, word, is_private)
+        index.public = Trie.build(sorted(index._ids))
+        return index
+
+    def _track(self, row_id, word, is_private):
+        if not word or is_private:
+            return None
+        self._rows[row_id] = word
+        self._ids[word].add(row_id)
+        return word
+
+    def add(self, row_id, word, is_private):
+        self.remove(row_id)
+        word = self._track(row_id, word, is_private)
+        if word is not None and len(self._ids[word]) == 1:
+            self.public.insert(word)
+
+    def remove(self, row_id):
+        self.remove_many([row_id])
+
+    def remove_many(self, row_ids):
+        # Words whose last row goes are deleted from the trie in one batch
+        dropped = []
+        for row_id in row_ids:
+            word = self._rows.pop(row_id, None)
+            if word is None:
+                continue
+            self._ids[word].discard(row_id)
+            if not self._ids[word]:
+                del self._ids[word]
+                dropped.append(word)
+        self.public.delete_many(dropped)
+
+    def reconcile(self, words, rows):
+        # Brings words in line with their (id, word, is_private) rows as read
+        # from the table: rows deleted, renamed or made private by another
+        # process are dropped, public rows it added are tracked. Returns the
+        # words that were dropped from the trie.
+        words = set(words)
+        public = {row_id: word for row_id, word, is_private in rows if word in words and not is_private}
+        stale = [row_id for word in words for row_id in self._ids.get(word, ()) if row_id not in public]
+        before = set(self._ids)
+        self.remove_many(stale)
+        for row_id, word in public.items():
+            self.add(row_id, word, False)
+        return (before - set(self._ids)) & words
+
+    def complete(self, prefix, k=10):
+        return self.public.complete(prefix, k)
+
+
+def merge_completions(results, k):
+    # Trie.complete ranks unscored words shortest first, then alphabetically
+    return sorted(set().union(*results), key=lambda word: (len(word), word))[:k]
+
+
+async def build_autocomplete(db):
+    indexes = {}
+    for name, (table, id_column) in LAYERS.items():
+        query = select(id_column, table.word, table.is_private)
+        result = await db.stream(query.execution_options(yield_per=FETCH_CHUNK))
+        indexes[name] = LayerIndex.load([tuple(row) async for row in result])
+    return indexes
+
+
+async def verified_complete(db, name, index, prefix, k=10):
+    # Completions re-checked against the table. Another worker's deletes and
+    # edits only reach this index on the next rebuild, so every candidate's
+    # rows are read back and the stale ones dropped from the index; the
+    # trie is asked again until all k candidates hold up.
+    table, id_column = LAYERS[name]
+    while True:
+        words = index.complete(prefix, k)
+        if not words:
+            return words
+        result = await db.execute(select(id_column, table.word, table.is_private).where(table.word.in_(words)))
+        if not index.reconcile(words, [tuple(row) for row in result]):
+            return words
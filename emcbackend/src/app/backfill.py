@@ -0,0 +1,323 @@
+# Fills first_layer.deepl_translation for the rows that have none, in
+# pre_id order. Runs inside the API when BACKFILL_ENABLED=1, or on its own
+# from emcbackend/src: python -m app.backfill [--once]. However many API
+# workers and standalone runs are started, only the one holding the lease
+# on the checkpoint row translates; the others stand by.
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import bindparam, or_, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from app.batcher import BATCH_MAX_CHARS, BATCH_MAX_TEXTS
+from app.db import POOL_SIZE, SessionLocal, invalidate, pool_status
+from app.deepl import DeeplError
+from app.keypool import KeysExhausted
+from app.models import FirstLayer, WorkerCheckpoint
+from app.translation_cache import cache_key, cache_rows, normalise_source
+
+BACKFILL_ENABLED = os.environ.get("BACKFILL_ENABLED") == "1"
+BACKFILL_TARGET_LANG = os.environ.get("BACKFILL_TARGET_LANG", "DE")
+BACKFILL_SOURCE_LANG = os.environ.get("BACKFILL_SOURCE_LANG") or None
+# Rows read per page and DeepL requests in flight at once
+BACKFILL_PAGE = int(os.environ.get("BACKFILL_PAGE", "200"))
+BACKFILL_CONCURRENCY = int(os.environ.get("BACKFILL_CONCURRENCY", "2"))
+# Retries of a failed DeepL request, waiting BACKFILL_BACKOFF * 2**attempt
+# seconds (jittered, capped at BACKFILL_BACKOFF_MAX) in between
+BACKFILL_RETRIES = int(os.environ.get("BACKFILL_RETRIES", "5"))
+BACKFILL_BACKOFF = float(os.environ.get("BACKFILL_BACKOFF", "1"))
+BACKFILL_BACKOFF_MAX = float(os.environ.get("BACKFILL_BACKOFF_MAX", "60"))
+# Seconds to wait once every row is done or after a failed page
+BACKFILL_IDLE = float(os.environ.get("BACKFILL_IDLE", "60"))
+# Backpressure: the worker pauses while live traffic holds all but
+# BACKFILL_DB_RESERVE primary connections or has BACKFILL_LIVE_REQUESTS
+# DeepL requests in flight, and while the keys have fewer than
+# BACKFILL_KEY_RESERVE characters left, which are kept for /translate
+BACKFILL_PAUSE = float(os.environ.get("BACKFILL_PAUSE", "1"))
+BACKFILL_DB_RESERVE = int(os.environ.get("BACKFILL_DB_RESERVE", "2"))
+BACKFILL_LIVE_REQUESTS = int(os.environ.get("BACKFILL_LIVE_REQUESTS", "4"))
+BACKFILL_KEY_RESERVE = int(os.environ.get("BACKFILL_KEY_RESERVE", "50000"))
+# Seconds a claim on the checkpoint lasts without renewal. It is renewed
+# with every page, so it has to outlast a page with all its retries; a
+# worker that dies is taken over once its claim runs out.
+BACKFILL_LEASE = float(os.environ.get("BACKFILL_LEASE", "600"))
+
+CHECKPOINT = "first_layer_translation"
+UNTRANSLATED = or_(FirstLayer.deepl_translation.is_(None), FirstLayer.deepl_translation == "")
+HAS_WORD = (FirstLayer.word.isnot(None), FirstLayer.word != "")
+# The UNTRANSLATED guard leaves rows someone filled in meanwhile alone
+FILL = (FirstLayer.__table__.update()
+        .where(FirstLayer.pre_id == bindparam("row_id"), UNTRANSLATED)
+        .values(deepl_translation=bindparam("translation")))
+# DeepL statuses worth retrying; anything else fails the page
+RETRY_STATUSES = {429, 500, 502, 503, 504, 529}
+
+
+async def load_checkpoint(db, name):
+    result = await db.execute(select(WorkerCheckpoint.position).where(WorkerCheckpoint.name == name))
+    return result.scalar() or 0
+
+
+async def save_checkpoint(db, name, position):
+    # The caller commits
+    table = WorkerCheckpoint.__table__
+    result = await db.execute(table.update().where(table.c.name == name).values(position=position))
+    if not result.rowcount:
+        await db.execute(table.insert().values(name=name, position=position))
+
+
+async def acquire_lease(db, name, owner, seconds):
+    # Claims or renews name's checkpoint row for owner unless another owner
+    # holds an unexpired claim; returns whether owner holds it. The caller
+    # commits.
+    table = WorkerCheckpoint.__table__
+    now = datetime.utcnow()
+    lease = {"owner": owner, "lease_until": now + timedelta(seconds=seconds)}
+    result = await db.execute(
+        table.update()
+        .where(table.c.name == name, or_(table.c.owner.is_(None), table.c.owner == owner, table.c.lease_until < now))
+        .values(**lease)
+    )
+    if result.rowcount:
+        return True
+    if (await db.execute(select(table.c.name).where(table.c.name == name))).first():
+        return False
+    try:
+        async with db.begin_nested():
+            await db.execute(table.insert().values(name=name, position=0, **lease))
+    except IntegrityError:
+        return False  # another process created the row first
+    return True
+
+
+async def release_lease(db, name, owner):
+    # The caller commits
+    table = WorkerCheckpoint.__table__
+    await db.execute(table.update().where(table.c.name == name, table.c.owner == owner)
+                     .values(owner=None, lease_until=None))
+
+
+def _chunks(texts, max_texts=BATCH_MAX_TEXTS, max_chars=BATCH_MAX_CHARS):
+    # Splits texts into DeepL-sized requests, keeping their order
+    chunk, chars = [], 0
+    for text in texts:
+        if chunk and (len(chunk) >= max_texts or chars + len(text) > max_chars):
+            yield chunk
+            chunk, chars = [], 0
+        chunk.append(text)
+        chars += len(text)
+    if chunk:
+        yield chunk
+
+
+class Backfill:
+    # One page at a time: read the next untranslated rows after the
+    # checkpoint, take what the translation cache already knows, send the
+    # rest to DeepL through the key pool in concurrent requests, then write
+    # the cache rows, one executemany UPDATE and the new checkpoint in a
+    # single commit. No connection is held while DeepL is working.
+    # on_page(rows) runs after every commit with (pre_id, word, meaning,
+    # translation) tuples. live is the API's TranslationBatcher, if any.
+    # Pages are only read while this instance holds the checkpoint lease.
+    def __init__(self, pool, client, cache, target_lang=BACKFILL_TARGET_LANG, source_lang=BACKFILL_SOURCE_LANG,
+                 page_size=BACKFILL_PAGE, concurrency=BACKFILL_CONCURRENCY, live=None, on_page=None,
+                 sessions=SessionLocal):
+        self.pool = pool
+        self.client = client
+        self.cache = cache
+        self.target_lang = target_lang
+        self.source_lang = source_lang
+        self.page_size = page_size
+        self.live = live
+        self.on_page = on_page
+        self.sessions = sessions
+        self._requests = asyncio.Semaphore(concurrency)
+        self.owner = uuid.uuid4().hex
+        self.leased = False
+        self.position = None
+        self.rows = 0
+        self.cache_hits = 0
+        self.translated = 0
+        self.retries = 0
+        self.pauses = 0
+        self.failures = 0
+        self.paused = None
+        self.seconds = 0.0
+
+    def busy(self):
+        # Why the worker should hold off right now, or None
+        checked_out = pool_status().get("checked_out")
+        if checked_out is not None and checked_out >= POOL_SIZE - BACKFILL_DB_RESERVE:
+            return "database pool busy"
+        if self.live is not None and self.live.in_flight >= BACKFILL_LIVE_REQUESTS:
+            return "live DeepL traffic"
+        if self.pool.headroom() < BACKFILL_KEY_RESERVE:
+            return "DeepL quota reserved for live traffic"
+        return None
+
+    async def _translate(self, texts):
+        async with self._requests:
+            for attempt in range(BACKFILL_RETRIES + 1):
+                try:
+                    return await self.pool.translate(self.client, texts, self.target_lang, self.source_lang)
+                except DeeplError as e:
+                    if e.status_code not in RETRY_STATUSES or attempt == BACKFILL_RETRIES:
+                        raise
+                except httpx.HTTPError:
+                    if attempt == BACKFILL_RETRIES:
+                        raise
+                self.retries += 1
+                await asyncio.sleep(min(BACKFILL_BACKOFF_MAX, BACKFILL_BACKOFF * 2 ** attempt)
+                                    * random.uniform(0.5, 1))
+
+    async def claim(self):
+        # Takes or renews the lease; returns whether this instance holds it
+        async with self.sessions() as db:
+            leased = await acquire_lease(db, CHECKPOINT, self.owner, BACKFILL_LEASE)
+            await db.commit()
+        if leased and not self.leased:
+            # Whoever held the lease before may have moved the checkpoint
+            self.position = None
+        self.leased = leased
+        return leased
+
+    async def release(self):
+        async with self.sessions() as db:
+            await release_lease(db, CHECKPOINT, self.owner)
+            await db.commit()
+        self.leased = False
+
+    async def step(self):
+        # Backfills one page; returns the number of rows it covered
+        async with self.sessions() as db:
+            if self.position is None:
+                self.position = await load_checkpoint(db, CHECKPOINT)
+            result = await db.execute(
+                select(FirstLayer.pre_id, FirstLayer.word, FirstLayer.meaning)
+                .where(UNTRANSLATED, *HAS_WORD, FirstLayer.pre_id > self.position)
+                .order_by(FirstLayer.pre_id).limit(self.page_size)
+            )
+            rows = result.fetchall()
+            if not rows:
+                return 0
+            keys = [cache_key(row.word, self.source_lang, self.target_lang, None) for row in rows]
+            found = await self.cache.get_many(db, list(dict.fromkeys(keys)))
+
+        pending = {}
+        for key, row in zip(keys, rows):
+            if key not in found and key not in pending:
+                pending[key] = normalise_source(row.word)
+        self.cache_hits += len(rows) - len(pending)
+        chunks = list(_chunks(list(pending.values())))
+        translated = await asyncio.gather(*(self._translate(chunk) for chunk in chunks))
+        new_rows = cache_rows(pending, [text for chunk in translated for text in chunk], self.target_lang,
+                              self.source_lang)
+        found.update((row["key_hash"], row["translation"]) for row in new_rows)
+
+        filled = [(row.pre_id, row.word, row.meaning, found[key]) for key, row in zip(keys, rows)]
+        async with self.sessions() as db:
+            await self.cache.put_many(db, new_rows)
+            await db.execute(FILL, [{"row_id": pre_id, "translation": translation}
+                                    for pre_id, _, _, translation in filled])
+            # The translations are kept either way, but a worker that lost
+            # the lease while DeepL was working leaves the checkpoint alone
+            self.leased = await acquire_lease(db, CHECKPOINT, self.owner, BACKFILL_LEASE)
+            if self.leased:
+                await save_checkpoint(db, CHECKPOINT, rows[-1].pre_id)
+            await db.commit()
+        self.position = rows[-1].pre_id
+        self.rows += len(rows)
+        self.translated += len(pending)
+        invalidate(*(f"first_layer:{row.pre_id}" for row in rows))
+        if self.on_page is not None:
+            self.on_page(filled)
+        return len(rows)
+
+    async def run(self, once=False):
+        # once: stop when no untranslated row is left (or on the first
+        # failure, or when another worker holds the lease) instead of
+        # waiting for new rows
+        try:
+            while True:
+                self.paused = self.busy()
+                if self.paused:
+                    self.pauses += 1
+                    await asyncio.sleep(BACKFILL_PAUSE)
+                    continue
+                start = time.perf_counter()
+                try:
+                    if not await self.claim():
+                        if once:
+                            return self.stats()
+                        await asyncio.sleep(BACKFILL_IDLE)
+                        continue
+                    done = await self.step()
+                except (KeysExhausted, DeeplError, httpx.HTTPError, SQLAlchemyError) as e:
+                    self.failures += 1
+                    if once:
+                        raise
+                    print(f"Translation backfill failed after row {self.position}: {e}")
+                    await asyncio.sleep(BACKFILL_IDLE)
+                    continue
+                self.seconds += time.perf_counter() - start
+                if not done:
+                    if once:
+                        return self.stats()
+                    await asyncio.sleep(BACKFILL_IDLE)
+        finally:
+            if self.leased:
+                try:
+                    await self.release()
+                except SQLAlchemyError as e:
+                    print(f"Translation backfill could not release its lease: {e}")
+
+    def stats(self):
+        return {
+            "target_lang": self.target_lang,
+            "leased": self.leased,
+            "position": self.position,
+            "rows": self.rows,
+            "cache_hits": self.cache_hits,
+            "translated": self.translated,
+            "retries": self.retries,
+            "failures": self.failures,
+            "pauses": self.pauses,
+            "paused": self.paused,
+            "rows_per_sec": round(self.rows / self.seconds, 1) if self.seconds else 0.0,
+        }
+
+
+async def main():
+    from app.deepl import make_client
+    from app.keypool import KeyPool, follow_key_pool, sync_key_pool
+    from app.translation_cache import TranslationCache
+
+    parser = argparse.ArgumentParser(description="Fill in missing DeepL translations of first_layer words")
+    parser.add_argument("--once", action="store_true", help="exit when no untranslated row is left")
+    parser.add_argument("--target-lang", default=BACKFILL_TARGET_LANG)
+    parser.add_argument("--source-lang", default=BACKFILL_SOURCE_LANG)
+    parser.add_argument("--page-size", type=int, default=BACKFILL_PAGE)
+    parser.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY)
+    args = parser.parse_args()
+
+    client = make_client()
+    pool = KeyPool()
+    await sync_key_pool(pool, client)
+    sync = asyncio.create_task(follow_key_pool(pool, client))
+    backfill = Backfill(pool, client, TranslationCache(), args.target_lang, args.source_lang, args.page_size,
+                        args.concurrency)
+    try:
+        print(await backfill.run(once=args.once))
+    finally:
+        sync.cancel()
+        await client.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
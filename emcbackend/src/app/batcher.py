@@ -0,0 +1,94 @@
+import asyncio
+import os
+
+# A batch is sent when its first request has waited BATCH_DELAY seconds, or
+# earlier once it holds BATCH_MAX_TEXTS texts (DeepL's per-request limit is
+# 50) or BATCH_MAX_CHARS characters
+BATCH_DELAY = float(os.environ.get("DEEPL_BATCH_DELAY_MS", "5")) / 1000
+BATCH_MAX_TEXTS = int(os.environ.get("DEEPL_BATCH_MAX_TEXTS", "50"))
+BATCH_MAX_CHARS = int(os.environ.get("DEEPL_BATCH_MAX_CHARS", "30000"))
+
+
+class _Batch:
+    def __init__(self):
+        self.texts = []
+        self.futures = []
+        self.chars = 0
+        self.timer = None
+
+
+class TranslationBatcher:
+    # Gathers concurrent translate() calls that share a language pair and
+    # glossary (a DeepL glossary id, or the name of a synced one) into one
+    # DeepL request through the key pool; each caller awaits its own future
+    # and gets its own text back (or the error).
+    def __init__(self, pool, client, delay=BATCH_DELAY, max_texts=BATCH_MAX_TEXTS, max_chars=BATCH_MAX_CHARS):
+        self.pool = pool
+        self.client = client
+        self.delay = delay
+        self.max_texts = max_texts
+        self.max_chars = max_chars
+        self._batches = {}
+        self._sending = set()
+        self.requests = 0
+        self.texts = 0
+
+    async def translate(self, text, target_lang, source_lang=None, glossary_id=None, glossary=None):
+        group = (target_lang, source_lang, glossary_id, glossary)
+        batch = self._batches.get(group)
+        if batch is not None and (len(batch.texts) >= self.max_texts or batch.chars + len(text) > self.max_chars):
+            self._send(group)
+            batch = None
+        if batch is None:
+            batch = self._batches[group] = _Batch()
+            batch.timer = asyncio.get_running_loop().call_later(self.delay, self._send, group)
+        future = asyncio.get_running_loop().create_future()
+        batch.texts.append(text)
+        batch.futures.append(future)
+        batch.chars += len(text)
+        if len(batch.texts) >= self.max_texts:
+            self._send(group)
+        return await future
+
+    async def translate_many(self, texts, target_lang, source_lang=None, glossary_id=None, glossary=None):
+        return await asyncio.gather(*(self.translate(text, target_lang, source_lang, glossary_id, glossary)
+                                      for text in texts))
+
+    def _send(self, group):
+        batch = self._batches.pop(group, None)
+        if batch is None:
+            return
+        batch.timer.cancel()
+        task = asyncio.create_task(self._request(group, batch))
+        self._sending.add(task)
+        task.add_done_callback(self._sending.discard)
+
+    async def _request(self, group, batch):
+        target_lang, source_lang, glossary_id, glossary = group
+        self.requests += 1
+        self.texts += len(batch.texts)
+        try:
+            results = await self.pool.translate(self.client, batch.texts, target_lang, source_lang, glossary_id,
+                                                glossary)
+        except Exception as e:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(batch.futures, results):
+            if not future.done():
+                future.set_result(result)
+
+    @property
+    def in_flight(self):
+        # DeepL requests sent and not yet answered
+        return len(self._sending)
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "texts": self.texts,
+            "texts_per_request": round(self.texts / self.requests, 2) if self.requests else 0.0,
+            "pending": sum(len(batch.texts) for batch in self._batches.values()),
+            "in_flight": self.in_flight,
+        }
@@ -0,0 +1,56 @@
+import os
+
+from pydantic import ValidationError
+from sqlalchemy import select
+
+# Rows per multi-row INSERT statement; the endpoints accept ?chunk_size=
+BULK_CHUNK = int(os.environ.get("BULK_INSERT_CHUNK", "500"))
+MAX_BULK_CHUNK = 5000
+
+
+def validate_rows(model, rows):
+    # Returns (index, validated row) pairs and per-row errors, so one bad
+    # row does not reject the whole batch
+    valid, errors = [], []
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, model(**row)))
+        except ValidationError as e:
+            detail = [{"field": ".".join(str(part) for part in err["loc"]), "msg": err["msg"]} for err in e.errors()]
+            errors.append({"index": index, "detail": detail})
+    return valid, errors
+
+
+async def bulk_insert(db, table, id_column, values, chunk_size=BULK_CHUNK):
+    # One multi-row INSERT per chunk; the caller commits, so the batch is a
+    # single transaction. Returns the new primary keys in input order.
+    ids = []
+    dialect = (await db.connection()).dialect
+    for start in range(0, len(values), chunk_size):
+        chunk = values[start:start + chunk_size]
+        if dialect.insert_executemany_returning_sort_by_parameter_order:
+            # Sent as multi-row INSERT ... RETURNING with ids in input order
+            query = table.insert().returning(id_column, sort_by_parameter_order=True)
+            result = await db.execute(query, chunk)
+            ids.extend(result.scalars().all())
+        else:
+            # MySQL reports the id of the first row of a multi-row INSERT and
+            # allocates the rest consecutively for inserts of known size
+            result = await db.execute(table.insert().values(chunk))
+            ids.extend(range(result.lastrowid, result.lastrowid + len(chunk)))
+    return ids
+
+
+async def bulk_delete(db, table, id_column, ids, chunk_size=BULK_CHUNK):
+    # One SELECT and one DELETE ... WHERE id IN (...) per chunk; the caller
+    # commits. Returns the ids that existed, in input order.
+    deleted = []
+    ids = list(dict.fromkeys(ids))
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        result = await db.execute(select(id_column).where(id_column.in_(chunk)))
+        found = set(result.scalars().all())
+        if found:
+            await db.execute(table.delete().where(id_column.in_(found)))
+        deleted.extend(row_id for row_id in chunk if row_id in found)
+    return deleted
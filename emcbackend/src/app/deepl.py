@@ -0,0 +1,105 @@
+import os
+
+import httpx
+
+# Overrides the DeepL endpoint for every key, e.g. the local mock server
+# (python -m mock_deepl) in development
+DEEPL_API_URL = os.environ.get("DEEPL_API_URL")
+DEEPL_TIMEOUT = float(os.environ.get("DEEPL_TIMEOUT", "10"))
+
+
+class DeeplError(Exception):
+    def __init__(self, status_code, detail=""):
+        super().__init__(f"DeepL returned {status_code}: {detail}")
+        self.status_code = status_code
+
+
+class QuotaExceeded(DeeplError):
+    pass
+
+
+def api_url(key):
+    # Free-plan keys end in ":fx" and have their own host
+    if DEEPL_API_URL:
+        return DEEPL_API_URL.rstrip("/")
+    return "https://api-free.deepl.com" if key.endswith(":fx") else "https://api.deepl.com"
+
+
+def make_client():
+    # One pooled client per process, shared by every DeepL call
+    return httpx.AsyncClient(timeout=DEEPL_TIMEOUT, limits=httpx.Limits(max_keepalive_connections=20))
+
+
+async def _request(client, method, key, path, **kwargs):
+    response = await client.request(method, f"{api_url(key)}{path}",
+                                    headers={"Authorization": f"DeepL-Auth-Key {key}"}, **kwargs)
+    if response.status_code == 456:
+        raise QuotaExceeded(456, response.text)
+    if response.status_code >= 400:
+        raise DeeplError(response.status_code, response.text)
+    return response
+
+
+async def get_usage(client, key):
+    # Returns (characters used, character limit) for the billing period
+    data = (await _request(client, "GET", key, "/v2/usage")).json()
+    return data["character_count"], data["character_limit"]
+
+
+async def translate(client, key, texts, target_lang, source_lang=None, glossary_id=None):
+    body = {"text": list(texts), "target_lang": target_lang}
+    if source_lang:
+        body["source_lang"] = source_lang
+    if glossary_id:
+        body["glossary_id"] = glossary_id
+    data = (await _request(client, "POST", key, "/v2/translate", json=body)).json()
+    return [item["text"] for item in data["translations"]]
+
+
+# Multilingual (v3) glossaries. Entries travel as TSV, one "source\ttarget"
+# pair per line. A glossary belongs to the account of the key that made it.
+def entries_tsv(entries):
+    return "\n".join(f"{source}\t{target}" for source, target in entries.items())
+
+
+def parse_tsv(text):
+    entries = {}
+    for line in text.splitlines():
+        source, _, target = line.partition("\t")
+        if source:
+            entries[source] = target
+    return entries
+
+
+def _dictionary(source_lang, target_lang, entries):
+    return {"source_lang": source_lang.lower(), "target_lang": target_lang.lower(),
+            "entries": entries_tsv(entries), "entries_format": "tsv"}
+
+
+async def find_glossary(client, key, name):
+    # Id of the key's glossary called name, or None
+    data = (await _request(client, "GET", key, "/v3/glossaries")).json()
+    return next((glossary["glossary_id"] for glossary in data["glossaries"] if glossary["name"] == name), None)
+
+
+async def create_glossary(client, key, name, source_lang, target_lang, entries):
+    body = {"name": name, "dictionaries": [_dictionary(source_lang, target_lang, entries)]}
+    return (await _request(client, "POST", key, "/v3/glossaries", json=body)).json()["glossary_id"]
+
+
+async def glossary_entries(client, key, glossary_id, source_lang, target_lang):
+    params = {"source_lang": source_lang.lower(), "target_lang": target_lang.lower()}
+    data = (await _request(client, "GET", key, f"/v3/glossaries/{glossary_id}/entries", params=params)).json()
+    return parse_tsv(data["dictionaries"][0]["entries"]) if data["dictionaries"] else {}
+
+
+async def merge_glossary_entries(client, key, glossary_id, source_lang, target_lang, entries):
+    # PATCH adds the entries and replaces ones with the same source term
+    body = {"dictionaries": [_dictionary(source_lang, target_lang, entries)]}
+    await _request(client, "PATCH", key, f"/v3/glossaries/{glossary_id}", json=body)
+
+
+async def replace_glossary_entries(client, key, glossary_id, source_lang, target_lang, entries):
+    # PUT swaps the whole dictionary; the only way to drop entries
+    await _request(client, "PUT", key, f"/v3/glossaries/{glossary_id}/dictionaries",
+                   json=_dictionary(source_lang, target_lang, entries))
@@ -0,0 +1,82 @@
+import re
+
+from sqlalchemy import text
+
+# Table name -> (primary key, columns covered by the combined index). The
+# indexes are created by migrations/001_layer_fulltext.*.sql
+FULLTEXT_TABLES = {
+    "first_layer": ("pre_id", ("word", "meaning", "deepl_translation")),
+    "core_layer": ("id", ("word", "meaning", "deepl_translation", "additional_translation")),
+}
+# Relevance multipliers; columns not listed weigh 1
+FIELD_WEIGHTS = {"word": 3.0, "meaning": 1.0}
+MODES = ("natural", "boolean")
+
+_TOKEN = re.compile(r'([+-]?)("[^"]*"|[^\s"]+)')
+
+
+def _mysql_query(table, mode):
+    # MySQL only matches against the exact column list of a FULLTEXT index,
+    # so each weighted column has an index of its own next to the combined
+    # one used to find the rows
+    id_column, columns = FULLTEXT_TABLES[table]
+    against = f"AGAINST (:q IN {'BOOLEAN' if mode == 'boolean' else 'NATURAL LANGUAGE'} MODE)"
+    score = " + ".join(f"{weight} * MATCH({column}) {against}" for column, weight in FIELD_WEIGHTS.items())
+    return text(
+        f"SELECT {id_column} AS id, word, meaning, {score} + MATCH({', '.join(columns)}) {against} AS score "
+        f"FROM {table} WHERE MATCH({', '.join(columns)}) {against} ORDER BY score DESC LIMIT :limit"
+    )
+
+
+def _sqlite_query(table):
+    id_column, columns = FULLTEXT_TABLES[table]
+    weights = ", ".join(str(FIELD_WEIGHTS.get(column, 1.0)) for column in columns)
+    # bm25() is lower for better matches
+    return text(
+        f"SELECT t.{id_column} AS id, t.word, t.meaning, -bm25({table}_fts, {weights}) AS score "
+        f"FROM {table}_fts JOIN {table} t ON t.{id_column} = {table}_fts.rowid "
+        f"WHERE {table}_fts MATCH :q ORDER BY score DESC LIMIT :limit"
+    )
+
+
+def fts5_query(q, mode):
+    # Translates the MySQL query syntax into FTS5's: natural mode matches any
+    # term; boolean mode requires +terms, excludes -terms and only uses the
+    # plain terms when nothing is required. Returns None if nothing is left.
+    required, optional, excluded = [], [], []
+    for op, term in _TOKEN.findall(q):
+        prefix = term.endswith("*")
+        term = term.strip('"*').replace('"', "")
+        if not term.strip():
+            continue
+        term = f'"{term}"' + ("*" if prefix else "")
+        if mode == "boolean" and op == "+":
+            required.append(term)
+        elif mode == "boolean" and op == "-":
+            excluded.append(term)
+        else:
+            optional.append(term)
+    if required:
+        query = " AND ".join(required)
+    elif optional:
+        query = " OR ".join(optional)
+    else:
+        return None
+    if excluded:
+        query = f"({query}) NOT ({' OR '.join(excluded)})"
+    return query
+
+
+async def fulltext_search(db, table, q, mode, limit):
+    # Rows ranked by weighted relevance, as dicts with a score
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        query = _mysql_query(table, mode)
+    elif dialect == "sqlite":
+        query, q = _sqlite_query(table), fts5_query(q, mode)
+        if q is None:
+            return []
+    else:
+        raise NotImplementedError(f"full-text search is not available on {dialect}")
+    result = await db.execute(query, {"q": q, "limit": limit})
+    return [row._asdict() for row in result.fetchall()]
@@ -0,0 +1,322 @@
+# Glossary built from core_layer's curated word -> translation pairs. Known
+# terms are resolved here, inside phrases too, and only the rest of a text
+# goes to DeepL. The same entries are kept in a DeepL glossary on every key
+# for callers that want DeepL to see whole texts; one worker at a time, the
+# holder of the glossary lease, writes them.
+import asyncio
+import hashlib
+import os
+import re
+import uuid
+
+import httpx
+from sqlalchemy import or_, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.backfill import acquire_lease, release_lease
+from app.db import SessionLocal
+from app.deepl import (DeeplError, create_glossary, find_glossary, glossary_entries, merge_glossary_entries,
+                       replace_glossary_entries)
+from app.models import CoreLayer
+from app.translation_cache import translate_cached
+
+# core_layer holds one language pair; texts for any other pair skip it
+GLOSSARY_NAME = os.environ.get("GLOSSARY_NAME", "core_layer")
+GLOSSARY_SOURCE_LANG = os.environ.get("GLOSSARY_SOURCE_LANG", "EN")
+GLOSSARY_TARGET_LANG = os.environ.get("GLOSSARY_TARGET_LANG", "DE")
+# Seconds between reloads from core_layer and syncs to DeepL
+GLOSSARY_SYNC_INTERVAL = float(os.environ.get("GLOSSARY_SYNC_INTERVAL", "300"))
+# Seconds the worker_checkpoints lease of the DeepL sync lasts without
+# renewal; renewed every interval
+GLOSSARY_LEASE = float(os.environ.get("GLOSSARY_LEASE", str(3 * GLOSSARY_SYNC_INTERVAL)))
+FETCH_CHUNK = 1000
+
+# "local" resolves known terms here, "deepl" sends whole texts with the
+# synced glossary, "off" sends whole texts without one
+MODES = ("local", "deepl", "off")
+WORD = re.compile(r"\w+")
+
+
+def normalise_term(text):
+    return " ".join(text.casefold().split())
+
+
+def entries_version(entries):
+    return hashlib.sha256("\n".join(f"{word}\t{translation}" for word, translation in sorted(
+        entries.items())).encode()).hexdigest()[:16]
+
+
+class Glossary:
+    def __init__(self, source_lang=GLOSSARY_SOURCE_LANG, target_lang=GLOSSARY_TARGET_LANG):
+        self.source_lang = source_lang.upper()
+        self.target_lang = target_lang.upper()
+        self.entries = {}  # source term -> translation, as uploaded to DeepL
+        self.version = None
+        self._terms = {}  # normalised term -> translation
+        self._lengths = []  # word counts of the terms, longest first
+        self.texts = 0
+        self.texts_resolved = 0
+        self.terms_resolved = 0
+        self.chars = 0
+        self.chars_sent = 0
+
+    async def load(self, db):
+        # The first row of a word wins; deepl_translation is preferred over
+        # additional_translation. DeepL rejects tabs and newlines in entries.
+        # Private rows stay out: the glossary applies to every user.
+        query = (select(CoreLayer.word, CoreLayer.deepl_translation, CoreLayer.additional_translation)
+                 .where(or_(CoreLayer.is_private.is_(False), CoreLayer.is_private.is_(None)))
+                 .order_by(CoreLayer.id).execution_options(yield_per=FETCH_CHUNK))
+        entries = {}
+        async for word, deepl_translation, additional_translation in await db.stream(query):
+            word = (word or "").strip()
+            translation = (deepl_translation or additional_translation or "").strip()
+            if word and translation and not any(c in word + translation for c in "\t\r\n"):
+                entries.setdefault(word, translation)
+        self.set_entries(entries)
+
+    def set_entries(self, entries):
+        terms = {}
+        for word, translation in entries.items():
+            terms.setdefault(normalise_term(word), translation)
+        self.entries = entries
+        self._terms = terms
+        self._lengths = sorted({len(WORD.findall(term)) for term in terms} - {0}, reverse=True)
+        self.version = entries_version(entries)
+
+    def applies(self, target_lang, source_lang=None):
+        return target_lang.upper() == self.target_lang and (source_lang or self.source_lang).upper() == self.source_lang
+
+    def split(self, text):
+        # [(source, translation or None)] covering text in order. At every
+        # word the longest known term starting there wins.
+        segments = []
+        words = list(WORD.finditer(text))
+        last = i = 0
+        while i < len(words):
+            for n in self._lengths:
+                if i + n > len(words):
+                    continue
+                start, end = words[i].start(), words[i + n - 1].end()
+                translation = self._terms.get(normalise_term(text[start:end]))
+                if translation is not None:
+                    if start > last:
+                        segments.append((text[last:start], None))
+                    segments.append((text[start:end], translation))
+                    last = end
+                    i += n
+                    break
+            else:
+                i += 1
+        if last < len(text):
+            segments.append((text[last:], None))
+        return segments
+
+    def stats(self):
+        return {
+            "source_lang": self.source_lang,
+            "target_lang": self.target_lang,
+            "terms": len(self._terms),
+            "version": self.version,
+            "texts": self.texts,
+            "texts_resolved": self.texts_resolved,
+            "terms_resolved": self.terms_resolved,
+            "chars": self.chars,
+            "chars_sent": self.chars_sent,
+        }
+
+
+async def translate_resolved(db, cache, batcher, glossary, texts, target_lang, source_lang=None):
+    # Known terms come from the glossary; the stretches between them that
+    # contain words go through translate_cached, each on its own, and the
+    # pieces are joined back in source order with the original spacing
+    # and punctuation
+    split = [glossary.split(text) for text in texts]
+    pieces = {}
+    for segments in split:
+        for source, translation in segments:
+            if translation is None and WORD.search(source):
+                pieces.setdefault(source.strip())
+    if pieces:
+        translations = await translate_cached(db, cache, batcher, list(pieces), target_lang, source_lang)
+        pieces = dict(zip(pieces, translations))
+
+    results = []
+    for text, segments in zip(texts, split):
+        parts = []
+        for source, translation in segments:
+            if translation is not None:
+                parts.append(translation)
+                glossary.terms_resolved += 1
+            elif WORD.search(source):
+                core = source.strip()
+                parts.append(source[:len(source) - len(source.lstrip())] + pieces[core]
+                             + source[len(source.rstrip()):])
+                glossary.chars_sent += len(core)
+            else:
+                parts.append(source)
+        glossary.texts += 1
+        glossary.chars += len(text)
+        if all(translation is not None or not WORD.search(source) for source, translation in segments):
+            glossary.texts_resolved += 1
+        results.append("".join(parts))
+    return results
+
+
+class GlossarySync:
+    # Keeps a DeepL glossary called name with the glossary's entries on
+    # every key in the pool. The first sync of a key reads what DeepL holds;
+    # later ones send only the difference: added and changed entries are
+    # merged in with PATCH, while a removed entry means uploading the whole
+    # dictionary again with PUT since DeepL cannot delete single entries.
+    # Only the worker holding the lease named lease_name syncs; the others
+    # follow(), reading the glossary ids and entries the holder uploaded.
+    def __init__(self, glossary, pool, client, name=GLOSSARY_NAME):
+        self.glossary = glossary
+        self.pool = pool
+        self.client = client
+        self.name = name
+        self.lease_name = f"deepl_glossary:{name}"
+        self.owner = uuid.uuid4().hex
+        self.leased = False
+        self.version = None  # glossary version every key holds, if any
+        self._uploaded = {}  # key id -> entries DeepL holds
+        self.creates = 0
+        self.merges = 0
+        self.replaces = 0
+        self.entries_sent = 0
+
+    async def _sync_key(self, state, entries):
+        source_lang, target_lang = self.glossary.source_lang, self.glossary.target_lang
+        glossary_id = state.glossaries.get(self.name)
+        if glossary_id is None:
+            glossary_id = await find_glossary(self.client, state.key, self.name)
+            if glossary_id is None and not entries:
+                return
+            if glossary_id is None:
+                glossary_id = await create_glossary(self.client, state.key, self.name, source_lang, target_lang,
+                                                    entries)
+                self.creates += 1
+                self.entries_sent += len(entries)
+                self._uploaded[state.id] = entries
+                state.glossaries[self.name] = glossary_id
+                return
+            state.glossaries[self.name] = glossary_id
+        if state.id not in self._uploaded:
+            self._uploaded[state.id] = await glossary_entries(self.client, state.key, glossary_id, source_lang,
+                                                              target_lang)
+
+        uploaded = self._uploaded[state.id]
+        changed = {word: translation for word, translation in entries.items() if uploaded.get(word) != translation}
+        if uploaded.keys() - entries.keys():
+            await replace_glossary_entries(self.client, state.key, glossary_id, source_lang, target_lang, entries)
+            self.replaces += 1
+            self.entries_sent += len(entries)
+        elif changed:
+            await merge_glossary_entries(self.client, state.key, glossary_id, source_lang, target_lang, changed)
+            self.merges += 1
+            self.entries_sent += len(changed)
+        self._uploaded[state.id] = entries
+
+    async def sync(self):
+        entries, version = self.glossary.entries, self.glossary.version
+        states = self.pool.active()
+        results = await asyncio.gather(*(self._sync_key(state, entries) for state in states), return_exceptions=True)
+        failed = False
+        for state, result in zip(states, results):
+            if isinstance(result, (DeeplError, httpx.HTTPError)):
+                # Dropped so the next sync reads the glossary back from DeepL
+                state.glossaries.pop(self.name, None)
+                self._uploaded.pop(state.id, None)
+                print(f"DeepL glossary sync failed for key {state.id}: {result}")
+                failed = True
+            elif isinstance(result, Exception):
+                raise result
+        self.version = None if failed or not states else version
+
+    async def _read_key(self, state):
+        # Version of the entries DeepL holds for this key, or None
+        glossary_id = state.glossaries.get(self.name) or await find_glossary(self.client, state.key, self.name)
+        if glossary_id is None:
+            return None
+        state.glossaries[self.name] = glossary_id
+        return entries_version(await glossary_entries(self.client, state.key, glossary_id,
+                                                      self.glossary.source_lang, self.glossary.target_lang))
+
+    async def follow(self):
+        # Read-only: picks up the glossary ids the lease holder created and
+        # the version, if every key holds the same entries. What this worker
+        # knew as a holder is dropped, since DeepL's copies move on.
+        self._uploaded.clear()
+        states = self.pool.active()
+        results = await asyncio.gather(*(self._read_key(state) for state in states), return_exceptions=True)
+        versions = set()
+        for state, result in zip(states, results):
+            if isinstance(result, (DeeplError, httpx.HTTPError)):
+                state.glossaries.pop(self.name, None)
+                print(f"DeepL glossary read failed for key {state.id}: {result}")
+                result = None
+            elif isinstance(result, Exception):
+                raise result
+            versions.add(result)
+        self.version = versions.pop() if len(versions) == 1 else None
+
+    async def claim(self):
+        async with SessionLocal() as db:
+            self.leased = await acquire_lease(db, self.lease_name, self.owner, GLOSSARY_LEASE)
+            await db.commit()
+        return self.leased
+
+    async def release(self):
+        async with SessionLocal() as db:
+            await release_lease(db, self.lease_name, self.owner)
+            await db.commit()
+        self.leased = False
+
+    async def run(self):
+        # Syncs as the lease holder, or follows the one who is
+        if await self.claim():
+            await self.sync()
+        else:
+            await self.follow()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "leased": self.leased,
+            "version": self.version,
+            "keys": sorted(state.id for state in self.pool.active() if self.name in state.glossaries),
+            "creates": self.creates,
+            "merges": self.merges,
+            "replaces": self.replaces,
+            "entries_sent": self.entries_sent,
+        }
+
+
+async def refresh_glossary(glossary, sync):
+    # Reloads core_layer, so edits from any worker are picked up, then
+    # brings the DeepL copies up to date (or reads them, see GlossarySync)
+    async with SessionLocal() as db:
+        await glossary.load(db)
+    await sync.run()
+
+
+async def follow_glossary(glossary, sync, interval=GLOSSARY_SYNC_INTERVAL):
+    # The glossary is loaded at startup, so the first round only syncs
+    try:
+        try:
+            await sync.run()
+        except Exception as e:
+            print(f"Glossary sync failed: {e}")
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await refresh_glossary(glossary, sync)
+            except Exception as e:
+                print(f"Glossary sync failed: {e}")
+    finally:
+        if sync.leased:
+            try:
+                await sync.release()
+            except SQLAlchemyError as e:
+                print(f"Glossary sync could not release its lease: {e}")
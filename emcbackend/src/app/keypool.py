@@ -0,0 +1,184 @@
+import asyncio
+import os
+
+from sqlalchemy import select
+
+from app.db import SessionLocal, invalidate
+from app.deepl import DeeplError, QuotaExceeded, get_usage, translate
+from app.models import DeeplKey
+
+# "headroom" picks the key with the most characters left, "round_robin"
+# rotates through the keys that can still take the request
+KEY_STRATEGY = os.environ.get("DEEPL_KEY_STRATEGY", "headroom")
+QUOTA_REFRESH_INTERVAL = float(os.environ.get("DEEPL_QUOTA_REFRESH", "300"))
+
+
+class KeysExhausted(Exception):
+    pass
+
+
+class KeyState:
+    def __init__(self, key_id, key):
+        self.id = key_id
+        self.key = key
+        self.used = 0
+        self.limit = None  # unknown until the first usage refresh
+        self.glossaries = {}  # glossary name -> this account's glossary id
+
+    @property
+    def headroom(self):
+        return float("inf") if self.limit is None else self.limit - self.used
+
+    def as_dict(self):
+        return {"id": self.id, "used": self.used, "limit": self.limit,
+                "headroom": None if self.limit is None else self.headroom}
+
+
+class KeyPool:
+    # In-process view of the accessible deepl_keys rows. Characters are
+    # reserved when a key is handed out so concurrent callers spread over
+    # the keys; the background refresh replaces the estimates with DeepL's
+    # own counts. A key out of quota is only kept out of rotation until a
+    # refresh shows it has characters left again. A key DeepL rejects with
+    # 403 is gone for good: flush() writes those back as accessible=False
+    # in one UPDATE.
+    def __init__(self, strategy=KEY_STRATEGY):
+        if strategy not in ("headroom", "round_robin"):
+            raise ValueError(f"unknown key strategy {strategy!r}")
+        self.strategy = strategy
+        self._keys = {}
+        self._order = []
+        self._next = 0
+        self._exhausted = set()
+        self._revoked = set()
+
+    async def load(self, db):
+        result = await db.execute(select(DeeplKey.id, DeeplKey.key).where(DeeplKey.accessible.is_(True)))
+        self.set_keys(result.fetchall())
+
+    def set_keys(self, rows):
+        # (id, key) pairs; keeps the usage already known for keys that stay
+        keys = {}
+        for key_id, key in rows:
+            keys[key_id] = self._keys.get(key_id) or KeyState(key_id, key)
+            keys[key_id].key = key
+        self._keys = keys
+        self._order = sorted(keys)
+        self._exhausted &= set(keys)
+        self._revoked &= set(keys)
+
+    def active(self):
+        return [self._keys[key_id] for key_id in self._order
+                if key_id not in self._exhausted and key_id not in self._revoked]
+
+    def _available(self, chars, glossary=None):
+        return [state for state in self.active()
+                if state.headroom >= chars and (glossary is None or glossary in state.glossaries)]
+
+    def acquire(self, chars, glossary=None):
+        # glossary: only keys that hold a copy of this named glossary
+        candidates = self._available(chars, glossary)
+        if not candidates:
+            raise KeysExhausted(f"no DeepL key has {chars} characters left"
+                                + (f" and glossary {glossary!r}" if glossary else ""))
+        if self.strategy == "headroom":
+            state = max(candidates, key=lambda state: state.headroom)
+        else:
+            ids = [state.id for state in candidates]
+            state = next((self._keys[key_id] for key_id in ids if key_id >= self._next), candidates[0])
+            self._next = state.id + 1
+        state.used += chars
+        return state
+
+    def release(self, state, chars):
+        # Gives back a reservation for a call that did not go through
+        state.used = max(0, state.used - chars)
+
+    def mark_exhausted(self, state):
+        self._exhausted.add(state.id)
+
+    def mark_revoked(self, state):
+        self._revoked.add(state.id)
+
+    async def flush(self, db):
+        # One UPDATE for every key DeepL rejected since the last flush
+        revoked = [key_id for key_id in self._revoked if key_id in self._keys]
+        if not revoked:
+            return []
+        await db.execute(DeeplKey.__table__.update().where(DeeplKey.id.in_(revoked)).values(accessible=False))
+        await db.commit()
+        invalidate(*(f"deepl_keys:{key_id}" for key_id in revoked))
+        for key_id in revoked:
+            del self._keys[key_id]
+        self._order = sorted(self._keys)
+        self._exhausted -= self._revoked
+        self._revoked.clear()
+        return revoked
+
+    async def refresh(self, client):
+        # Fetches every key's usage concurrently, exhausted keys included,
+        # so a key whose quota was reset or raised goes back into rotation
+        states = list(self._keys.values())
+        results = await asyncio.gather(*(get_usage(client, state.key) for state in states), return_exceptions=True)
+        for state, result in zip(states, results):
+            if isinstance(result, DeeplError) and result.status_code == 403:
+                self.mark_revoked(state)
+            elif isinstance(result, DeeplError) and result.status_code == 456:
+                self.mark_exhausted(state)
+            elif isinstance(result, Exception):
+                print(f"DeepL usage refresh failed for key {state.id}: {result}")
+            else:
+                state.used, state.limit = result
+                if state.used >= state.limit:
+                    self.mark_exhausted(state)
+                else:
+                    self._exhausted.discard(state.id)
+
+    async def translate(self, client, texts, target_lang, source_lang=None, glossary_id=None, glossary=None):
+        # Tries keys until one accepts the request. glossary names a synced
+        # glossary (see app/glossary.py); each key uses its own copy.
+        chars = sum(len(text) for text in texts)
+        while True:
+            state = self.acquire(chars, glossary)
+            try:
+                return await translate(client, state.key, texts, target_lang, source_lang,
+                                       state.glossaries[glossary] if glossary else glossary_id)
+            except QuotaExceeded:
+                self.mark_exhausted(state)
+            except DeeplError as e:
+                self.release(state, chars)
+                if e.status_code != 403:
+                    raise
+                self.mark_revoked(state)
+            except Exception:
+                self.release(state, chars)
+                raise
+
+    def headroom(self):
+        # Characters left over the keys still in rotation
+        return sum(state.headroom for state in self.active())
+
+    def stats(self):
+        return {
+            "strategy": self.strategy,
+            "keys": [self._keys[key_id].as_dict() for key_id in self._order],
+            "exhausted": sorted(self._exhausted),
+            "revoked": sorted(self._revoked),
+        }
+
+
+async def sync_key_pool(pool, client):
+    # Pick up added keys, refresh usage and write back revoked ones
+    async with SessionLocal() as db:
+        await pool.load(db)
+        await pool.refresh(client)
+        await pool.flush(db)
+
+
+async def follow_key_pool(pool, client, interval=QUOTA_REFRESH_INTERVAL):
+    while True:
+        try:
+            await sync_key_pool(pool, client)
+        except Exception as e:
+            print(f"DeepL key pool refresh failed: {e}")
+        await asyncio.sleep(interval)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, func, TIMESTAMP, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, func, TIMESTAMP, Boolean, ForeignKey, Index
 from sqlalchemy.orm import declarative_base
 from pydantic import BaseModel
 from datetime import datetime
+from typing import List, Optional
 
 Base = declarative_base()
 ## deepl_keys db
@@ -18,6 +19,35 @@ class DeeplKeyResponse(BaseModel):
     accessible: bool
     ts: datetime
 
+## translation cache, one row per (normalised text, language pair, glossary)
+class Translation(Base):
+    __tablename__ = "translations"
+    key_hash = Column(String(64), primary_key=True)
+    source_text = Column(Text, nullable=False)
+    source_lang = Column(String(8), nullable=False)
+    target_lang = Column(String(8), nullable=False)
+    glossary_id = Column(String(64), nullable=False)
+    translation = Column(Text, nullable=False)
+    created_at = Column(TIMESTAMP, server_default=func.now())
+
+## background workers' progress, e.g. the last first_layer row backfilled
+class WorkerCheckpoint(Base):
+    __tablename__ = "worker_checkpoints"
+    name = Column(String(64), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)
+    # The process running the worker and when its claim runs out
+    owner = Column(String(64), nullable=True)
+    lease_until = Column(DateTime, nullable=True)
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+class TranslateRequest(BaseModel):
+    texts: List[str]
+    target_lang: str
+    source_lang: Optional[str] = None
+    glossary_id: Optional[str] = None
+    # core_layer terms: "local", "deepl" or "off" (see app/glossary.py)
+    terms: str = "local"
+
 ## users db
 class User(Base):
     __tablename__ = "users"
@@ -31,6 +61,17 @@ class User(Base):
     liked_words = Column(String(255), nullable=True)
     to_learn = Column(String(255), nullable=True)
 
+## user <-> word relations, replacing the liked_words / to_learn strings.
+## The primary key pages one user's list, ix_user_words_word answers
+## "which users have word X"
+class UserWord(Base):
+    __tablename__ = "user_words"
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    kind = Column(String(16), primary_key=True)
+    word = Column(String(255), primary_key=True)
+    added_at = Column(TIMESTAMP, server_default=func.now())
+    __table_args__ = (Index("ix_user_words_word", "kind", "word", "user_id"),)
+
 ## users db
 class UserCreate(BaseModel):
     username: str
@@ -38,8 +79,11 @@ class UserCreate(BaseModel):
     is_admin: bool
     is_super_admin: bool
     added_by: int
-    liked_words: str
-    to_learn: str
+    # Comma-separated words. On create they start the user's lists; on
+    # update they replace a list only when sent. The lists live in
+    # user_words (see /users/{id}/{kind}), not in the users columns.
+    liked_words: Optional[str] = None
+    to_learn: Optional[str] = None
 
 # SQLAlchemy Model for the first_layer table
 class FirstLayer(Base):
@@ -59,7 +103,9 @@ class FirstLayerCreate(BaseModel):
     meaning: str
     is_private: bool
     who_added: int
-    who_agreed: int
+    # Id of the user who approved the word for core_layer; omitted, null
+    # or 0 while nobody has
+    who_agreed: Optional[int] = None
     deepl_translation: str
 
 # SQLAlchemy Model for the core_layer table
@@ -0,0 +1,144 @@
+import os
+from collections import defaultdict
+
+from sqlalchemy import func, or_, select
+
+from app.models import User, UserWord, FirstLayer, CoreLayer
+from app.user_words import USER_WORD_LISTS
+
+# Table name -> (primary key column, columns searched by the *_search routes).
+# users_search also matches the words on users' lists: see user_word_search.
+INDEXED_COLUMNS = {
+    "users": (User.id, (User.username,)),
+    "first_layer": (FirstLayer.pre_id, (FirstLayer.word, FirstLayer.meaning, FirstLayer.deepl_translation)),
+    "core_layer": (CoreLayer.id, (CoreLayer.word, CoreLayer.meaning, CoreLayer.deepl_translation,
+                                  CoreLayer.additional_translation)),
+}
+FETCH_CHUNK = 1000
+# Seconds between rebuilds from the database. Rows other processes insert
+# are found straight away by the tail scan in infix_search; the rebuild
+# picks up rows they edited and keeps that tail short.
+INDEX_REFRESH_INTERVAL = float(os.environ.get("SEARCH_INDEX_REFRESH", "300"))
+
+
+class NgramIndex:
+    # Inverted index from lowercased character trigrams to row ids. A row
+    # contains a substring only if it contains all of the substring's
+    # trigrams, so intersecting their posting lists gives the candidates.
+    # built_through is the highest id the last build read from the table;
+    # rows above it are searched in the database instead.
+    def __init__(self, n=3):
+        self.n = n
+        self._postings = defaultdict(set)
+        self._grams = {}
+        self.built_through = 0
+
+    def _grams_of(self, texts):
+        grams = set()
+        for text in texts:
+            if text:
+                text = text.lower()
+                grams.update(text[i:i + self.n] for i in range(len(text) - self.n + 1))
+        return grams
+
+    def add(self, row_id, *texts):
+        self.remove(row_id)
+        grams = self._grams_of(texts)
+        for gram in grams:
+            self._postings[gram].add(row_id)
+        self._grams[row_id] = grams
+
+    def remove(self, row_id):
+        for gram in self._grams.pop(row_id, ()):
+            posting = self._postings[gram]
+            posting.discard(row_id)
+            if not posting:
+                del self._postings[gram]
+
+    def candidates(self, keyword):
+        # Returns None when the keyword is too short to have any trigram
+        grams = self._grams_of([keyword])
+        if not grams:
+            return None
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result &= posting
+        return result
+
+
+async def build_indexes(db):
+    indexes = {}
+    for name, (id_column, columns) in INDEXED_COLUMNS.items():
+        index = NgramIndex()
+        index.built_through = (await db.execute(select(func.coalesce(func.max(id_column), 0)))).scalar()
+        query = select(id_column, *columns).where(id_column <= index.built_through)
+        result = await db.stream(query.execution_options(yield_per=FETCH_CHUNK))
+        async for row in result:
+            index.add(row[0], *row[1:])
+        indexes[name] = index
+    indexes["user_words"] = await build_word_index(db)
+    return indexes
+
+
+async def build_word_index(db):
+    # Keyed by the words themselves, each distinct word once.
+    # added_through is the newest added_at the build saw.
+    index = NgramIndex()
+    index.added_through = (await db.execute(select(func.max(UserWord.added_at)))).scalar()
+    result = await db.stream(select(UserWord.word).distinct().execution_options(yield_per=FETCH_CHUNK))
+    async for (word,) in result:
+        index.add(word, word)
+    return index
+
+
+async def infix_search(db, name, index, keyword):
+    # Fetches only the candidate rows and re-checks the substring on them,
+    # since matching trigrams do not guarantee a contiguous match; rows
+    # deleted or edited elsewhere drop out here. Rows added after the index
+    # was built, by any process, come from a LIKE scan of the ids above
+    # built_through. Returns None for keywords shorter than a trigram so
+    # callers can fall back.
+    ids = index.candidates(keyword)
+    if ids is None:
+        return None
+    id_column, columns = INDEXED_COLUMNS[name]
+    ids = sorted(row_id for row_id in ids if row_id <= index.built_through)
+    queries = [select(id_column, *columns).where(id_column.in_(ids[start:start + FETCH_CHUNK]))
+               for start in range(0, len(ids), FETCH_CHUNK)]
+    queries.append(select(id_column, *columns).where(
+        id_column > index.built_through, or_(*(column.icontains(keyword, autoescape=True) for column in columns))))
+    keyword = keyword.lower()
+    rows = []
+    for query in queries:
+        result = await db.execute(query.order_by(id_column))
+        for row in result.fetchall():
+            if any(text and keyword in text.lower() for text in row[1:]):
+                rows.append(row)
+    return rows
+
+
+async def user_word_search(db, index, keyword):
+    # (id, username) of the users with a liked_words or to_learn word that
+    # contains keyword, by id. The index narrows the words down; words
+    # added since it was built, by any process, come from a LIKE scan of
+    # the rows added_at or after added_through. Returns None for keywords
+    # shorter than a trigram.
+    words = index.candidates(keyword)
+    if words is None:
+        return None
+    keyword = keyword.lower()
+    words = sorted(word for word in words if keyword in word.lower())
+    conditions = [UserWord.word.in_(words[start:start + FETCH_CHUNK]) for start in range(0, len(words), FETCH_CHUNK)]
+    tail = UserWord.word.icontains(keyword, autoescape=True)
+    if index.added_through is not None:
+        tail = tail & (UserWord.added_at >= index.added_through)
+    conditions.append(tail)
+    users = {}
+    for condition in conditions:
+        result = await db.execute(select(User.id, User.username).join(UserWord, UserWord.user_id == User.id)
+                                  .where(UserWord.kind.in_(USER_WORD_LISTS), condition).distinct())
+        users.update(result.fetchall())
+    return sorted(users.items())
@@ -0,0 +1,91 @@
+# Moves approved first_layer rows into core_layer. Run nightly from
+# emcbackend/src: python -m app.promote [--dry-run] [--chunk-size N]
+import argparse
+import asyncio
+import os
+import time
+
+from sqlalchemy import func, insert, select
+
+from app.models import FirstLayer, CoreLayer
+
+PROMOTE_CHUNK = int(os.environ.get("PROMOTE_CHUNK", "5000"))
+
+# A candidate is approved once a user has agreed to it: who_agreed holds
+# that user's id. Clients that predate the optional field send 0 for "not
+# yet", so NULL and 0 both mean unapproved (user ids start at 1).
+APPROVED = FirstLayer.who_agreed > 0
+# core_layer column -> expression over first_layer
+PROMOTED_COLUMNS = {
+    "word": FirstLayer.word,
+    "meaning": FirstLayer.meaning,
+    "is_private": FirstLayer.is_private,
+    "who_added": FirstLayer.who_added,
+    "who_agreed": FirstLayer.who_agreed,
+    "deepl_translation": FirstLayer.deepl_translation,
+    "created_at": func.now(),
+}
+
+
+async def promote(db, chunk_size=PROMOTE_CHUNK, dry_run=False, on_chunk=None):
+    # Each chunk is one INSERT ... SELECT plus one DELETE of the same ids,
+    # committed together, so a row is always in exactly one layer.
+    # on_chunk(pre_ids, core_rows) runs after every commit.
+    start = time.perf_counter()
+    if dry_run:
+        rows = (await db.execute(select(func.count()).select_from(FirstLayer).where(APPROVED))).scalar()
+        return {"dry_run": True, "rows": rows, "chunks": -(-rows // chunk_size), "seconds": 0.0, "rows_per_sec": 0.0}
+
+    rows = chunks = 0
+    after = 0
+    while True:
+        result = await db.execute(
+            select(FirstLayer.pre_id).where(APPROVED, FirstLayer.pre_id > after)
+            .order_by(FirstLayer.pre_id).limit(chunk_size)
+        )
+        pre_ids = result.scalars().all()
+        if not pre_ids:
+            break
+        after = pre_ids[-1]
+        chosen = (APPROVED, FirstLayer.pre_id.in_(pre_ids))
+        last_id = (await db.execute(select(func.coalesce(func.max(CoreLayer.id), 0)))).scalar()
+        await db.execute(
+            insert(CoreLayer.__table__).from_select(
+                list(PROMOTED_COLUMNS),
+                select(*PROMOTED_COLUMNS.values()).where(*chosen).order_by(FirstLayer.pre_id),
+            )
+        )
+        moved = await db.execute(FirstLayer.__table__.delete().where(*chosen))
+        core_rows = []
+        if on_chunk is not None:
+            result = await db.execute(CoreLayer.__table__.select().where(CoreLayer.id > last_id))
+            core_rows = result.fetchall()
+        await db.commit()
+        rows += moved.rowcount
+        chunks += 1
+        if on_chunk is not None:
+            on_chunk(pre_ids, core_rows)
+
+    seconds = time.perf_counter() - start
+    return {
+        "dry_run": False,
+        "rows": rows,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds else 0.0,
+    }
+
+
+async def main():
+    from app.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Promote approved first_layer rows to core_layer")
+    parser.add_argument("--dry-run", action="store_true", help="only count the rows that would move")
+    parser.add_argument("--chunk-size", type=int, default=PROMOTE_CHUNK)
+    args = parser.parse_args()
+    async with SessionLocal() as db:
+        print(await promote(db, args.chunk_size, args.dry_run))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
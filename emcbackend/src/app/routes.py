@@ -1,99 +1,187 @@
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, status
-from app.db import get_db2
-from app.models import DeeplKey, User, UserCreate, FirstLayer, FirstLayerCreate, CoreLayer, CoreLayerCreate
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from app.db import get_db2, get_read_db, pool_status, cached, invalidate, cache_stats
+from app.models import (DeeplKey, User, UserCreate, UserWord, FirstLayer, FirstLayerCreate, CoreLayer,
+                        CoreLayerCreate, TranslateRequest)
+from app.ngram import infix_search, user_word_search
+from app.autocomplete import merge_completions, verified_complete
+from app.streaming import ndjson_response
+from app.fulltext import MODES, fulltext_search
+from app.user_words import (USER_WORD_LISTS, add_words, remove_words, set_words, list_words, users_with_word,
+                            parse_words, word_rows)
+from app.promote import PROMOTE_CHUNK, promote
+from app.statements import (USER_COLUMNS, USER_FIELDS, INSERT_USER, SELECT_USER, UPDATE_USER, DELETE_USER,
+                            INSERT_FIRST, SELECT_FIRST, UPDATE_FIRST, DELETE_FIRST, INSERT_CORE, SELECT_CORE,
+                            UPDATE_CORE, DELETE_CORE, INSERT_DEEPL_KEY, SELECT_DEEPL_KEY, UPDATE_DEEPL_KEY,
+                            DELETE_DEEPL_KEY)
+from app.keypool import KeysExhausted, sync_key_pool
+from app.deepl import DeeplError
+from app.translation_cache import translate_cached
+from app.glossary import MODES as TERM_MODES, refresh_glossary, translate_resolved
+from app.bulk import BULK_CHUNK, MAX_BULK_CHUNK, validate_rows, bulk_insert, bulk_delete
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy import text, select
-from typing import List
+from typing import List, Optional
 
 ## todo: rewrite search to es, in case functional is not enough
-## todo: utilize deepl glossary funcs to enable PERFECT TRANSFUCKINGLATION
 router = APIRouter()
 
+# List endpoints page by primary key: ?after_id=<last id seen>&limit=.
+# ?stream=1 returns every row after after_id as NDJSON instead.
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
 ## USERS STUFF - DB CRUD ##
 @router.post("/users/")
-async def create_user(user: UserCreate, db=Depends(get_db2)):
-    try:
-        query = User.__table__.insert().values(
-            username=user.username,
-            password=user.password,
-            is_admin=user.is_admin,
-            is_super_admin=user.is_super_admin,
-            added_by=user.added_by,
-            liked_words=user.liked_words,
-            to_learn=user.to_learn
-        )
-
-        result = await db.execute(query)
+async def create_user(user: UserCreate, request: Request, db=Depends(get_db2)):
+    try:
+        result = await db.execute(INSERT_USER, user.dict(exclude=USER_FIELDS))
         user_id = result.inserted_primary_key[0]
+        # The lists go to user_words only
+        rows = word_rows(user_id, user)
+        if rows:
+            await db.execute(UserWord.__table__.insert(), rows)
 
         # Fetch the user data from the database using the inserted user_id
-        new_user_query = select(User).where(User.id == user_id)
-        new_user = await db.execute(new_user_query)
+        new_user = await db.execute(SELECT_USER, {"row_id": user_id})
         user_data = new_user.fetchone()._asdict()
 
         if user_data is None:
             raise HTTPException(status_code=404, detail="User not found")
 
         await db.commit()
+        request.app.state.search_index["users"].add(user_id, user.username)
+        _index_words(request, [row["word"] for row in rows])
 
         return {"id": user_id, "user_data": user_data}
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Failed to create user")
 
-@router.get("/users/{user_id}")
-async def get_user(user_id: int, db=Depends(get_db2)):
+# Declared before the /{id} routes so "bulk" is not taken for an id
+@router.post("/users/bulk")
+async def create_users_bulk(rows: List[dict], request: Request,
+                            chunk_size: int = Query(BULK_CHUNK, ge=1, le=MAX_BULK_CHUNK), db=Depends(get_db2)):
+    # Valid rows are inserted in one transaction, invalid ones are reported
+    # by their position in the request body
+    valid, errors = validate_rows(UserCreate, rows)
     try:
-        query = User.__table__.select().where(User.id == user_id)
-        print(query)
-        result = await db.execute(query)
+        names = [user.username for _, user in valid]
+        taken = set()
+        for start in range(0, len(names), chunk_size):
+            query = select(User.username).where(User.username.in_(names[start:start + chunk_size]))
+            result = await db.execute(query)
+            taken.update(result.scalars().all())
+        accepted = []
+        for index, user in valid:
+            if user.username in taken:
+                errors.append({"index": index, "detail": "Username already taken"})
+            else:
+                taken.add(user.username)
+                accepted.append((index, user))
+        ids = await bulk_insert(db, User.__table__, User.id, [user.dict(exclude=USER_FIELDS) for _, user in accepted],
+                                chunk_size)
+        words = [row for user_id, (_, user) in zip(ids, accepted) for row in word_rows(user_id, user)]
+        for start in range(0, len(words), chunk_size):
+            await db.execute(UserWord.__table__.insert(), words[start:start + chunk_size])
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to create users")
+    index = request.app.state.search_index["users"]
+    for user_id, (_, user) in zip(ids, accepted):
+        index.add(user_id, user.username)
+    _index_words(request, [row["word"] for row in words])
+    errors.sort(key=lambda error: error["index"])
+    return {"ids": ids, "errors": errors}
+
+@router.delete("/users/bulk")
+async def delete_users_bulk(ids: List[int], request: Request,
+                            chunk_size: int = Query(BULK_CHUNK, ge=1, le=MAX_BULK_CHUNK), db=Depends(get_db2)):
+    try:
+        deleted = await bulk_delete(db, User.__table__, User.id, ids, chunk_size)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to delete users")
+    invalidate(*(f"users:{row_id}" for row_id in deleted))
+    for row_id in deleted:
+        request.app.state.search_index["users"].remove(row_id)
+    found = set(deleted)
+    return {"deleted": deleted, "missing": [row_id for row_id in dict.fromkeys(ids) if row_id not in found]}
+
+@router.get("/users/{user_id}")
+async def get_user(user_id: int, db=Depends(get_read_db)):
+    async def load():
+        result = await db.execute(SELECT_USER, {"row_id": user_id})
         user = result.fetchone()
+        return user._asdict() if user else None
+
+    try:
+        user = await cached(f"users:{user_id}", load)
         if user is None:
             raise HTTPException(status_code=404, detail="User not found")
-        return user._asdict()
+        return user
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to fetch user")
 
 @router.put("/users/{user_id}")
-async def update_user(user_id: int, updated_user: UserCreate, db=Depends(get_db2)):
+async def update_user(user_id: int, updated_user: UserCreate, request: Request, db=Depends(get_db2)):
     try:
-        query = User.__table__.update().where(User.id == user_id).values(**updated_user.dict())
-        await db.execute(query)
+        await db.execute(UPDATE_USER, {"row_id": user_id, **updated_user.dict(exclude=USER_FIELDS)})
+        # A list is only replaced when the client sends it; otherwise the
+        # words added through /users/{id}/{kind} stay as they are
+        added = []
+        for kind in USER_WORD_LISTS:
+            if getattr(updated_user, kind) is not None:
+                added += (await set_words(db, user_id, kind, parse_words(getattr(updated_user, kind))))[0]
         await db.commit()
+        invalidate(f"users:{user_id}")
+        request.app.state.search_index["users"].add(user_id, updated_user.username)
+        _index_words(request, added)
         return {"message": "User updated successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update user")
 
 @router.delete("/users/{user_id}")
-async def delete_user(user_id: int, db=Depends(get_db2)):
+async def delete_user(user_id: int, request: Request, db=Depends(get_db2)):
     try:
-        query = User.__table__.delete().where(User.id == user_id)
-        await db.execute(query)
+        await db.execute(DELETE_USER, {"row_id": user_id})
         await db.commit()
+        invalidate(f"users:{user_id}")
+        request.app.state.search_index["users"].remove(user_id)
         return {"message": "User deleted successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete user")
 
 @router.get("/users/")
-async def get_all_users(db=Depends(get_db2)):
+async def get_all_users(after_id: int = 0, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        stream: bool = False, db=Depends(get_read_db)):
+    query = select(*USER_COLUMNS).where(User.id > after_id).order_by(User.id)
+    if stream:
+        return ndjson_response(query, db.bind)
     try:
-        query = User.__table__.select()
-        result = await db.execute(query)
+        result = await db.execute(query.limit(limit))
         users = result.fetchall()
-        print(users)
-        user = users[0]
         return [user._asdict() for user in users]
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to fetch users")
 
 ## Search functionality ##
 @router.get("/users_search")
-async def search_users(keyword: str, db=Depends(get_db2)) -> List[str]:
+async def search_users(keyword: str, request: Request, db=Depends(get_read_db)) -> List[str]:
     try:
+        # Matches on the username or on a word in the user's lists
+        rows = await infix_search(db, "users", request.app.state.search_index["users"], keyword)
+        if rows is not None:
+            users = dict(await user_word_search(db, request.app.state.search_index["user_words"], keyword))
+            users.update((row.id, row.username) for row in rows)
+            return [users[user_id] for user_id in sorted(users)]
+        # Keywords shorter than a trigram fall back to scanning
         query = text(
-            "SELECT * FROM users WHERE username LIKE :keyword OR liked_words LIKE :keyword OR to_learn LIKE :keyword"
+            "SELECT * FROM users WHERE username LIKE :keyword OR id IN "
+            "(SELECT user_id FROM user_words WHERE word LIKE :keyword) ORDER BY id"
         ).params(keyword=f"%{keyword}%")
         result = await db.execute(query)
         users = result.fetchall()
@@ -101,66 +189,197 @@ async def search_users(keyword: str, db=Depends(get_db2)) -> List[str]:
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to perform search")
 
+## User word lists ##
+def _index_words(request, words):
+    index = request.app.state.search_index["user_words"]
+    for word in words:
+        index.add(word, word)
+
+def _check_list(kind):
+    if kind not in USER_WORD_LISTS:
+        raise HTTPException(status_code=404, detail="List must be one of liked_words, to_learn")
+
+async def _check_user(db, user_id):
+    result = await db.execute(select(User.id).where(User.id == user_id))
+    if result.first() is None:
+        raise HTTPException(status_code=404, detail="User not found")
+
+@router.get("/users/{user_id}/{kind}")
+async def get_user_words(user_id: int, kind: str, after: str = "",
+                         limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db=Depends(get_read_db)):
+    # Pages by word: pass the last word of the previous page as after
+    _check_list(kind)
+    try:
+        return await list_words(db, user_id, kind, after, limit)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to fetch words")
+
+@router.post("/users/{user_id}/{kind}")
+async def add_user_words(user_id: int, kind: str, words: List[str], request: Request, db=Depends(get_db2)):
+    _check_list(kind)
+    try:
+        await _check_user(db, user_id)
+        added, existing = await add_words(db, user_id, kind, words)
+        await db.commit()
+        _index_words(request, added)
+        return {"added": added, "existing": existing}
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to add words")
+
+@router.delete("/users/{user_id}/{kind}")
+async def remove_user_words(user_id: int, kind: str, words: List[str], db=Depends(get_db2)):
+    _check_list(kind)
+    try:
+        removed, missing = await remove_words(db, user_id, kind, words)
+        await db.commit()
+        return {"removed": removed, "missing": missing}
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to remove words")
+
+@router.put("/users/{user_id}/{kind}/{word}")
+async def add_user_word(user_id: int, kind: str, word: str, request: Request, db=Depends(get_db2)):
+    return await add_user_words(user_id, kind, [word], request, db)
+
+@router.delete("/users/{user_id}/{kind}/{word}")
+async def remove_user_word(user_id: int, kind: str, word: str, db=Depends(get_db2)):
+    result = await remove_user_words(user_id, kind, [word], db)
+    if not result["removed"]:
+        raise HTTPException(status_code=404, detail="Word not on the list")
+    return result
+
+@router.get("/user_words/{kind}")
+async def get_users_with_word(kind: str, word: str, after_id: int = 0,
+                              limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db=Depends(get_read_db)):
+    # "Which users like word X"
+    _check_list(kind)
+    try:
+        return await users_with_word(db, kind, word, after_id, limit)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to fetch users")
+
 ## FIRST LAYER STUFF - DB CRUD##
 @router.post("/first_layer/")
-async def create_record(record: FirstLayerCreate, db=Depends(get_db2)):
-    try:
-        query = FirstLayer.__table__.insert().values(
-            word=record.word,
-            meaning=record.meaning,
-            is_private=record.is_private,
-            who_added=record.who_added,
-            who_agreed=record.who_agreed,
-            deepl_translation=record.deepl_translation
-        )
-        result = await db.execute(query)
+async def create_record(record: FirstLayerCreate, request: Request, db=Depends(get_db2)):
+    try:
+        result = await db.execute(INSERT_FIRST, record.dict(exclude={"pre_id"}))
         record_id = result.inserted_primary_key[0]
         await db.commit()
+        request.app.state.search_index["first_layer"].add(record_id, record.word, record.meaning,
+                                                          record.deepl_translation)
+        request.app.state.autocomplete["first"].add(record_id, record.word, record.is_private)
         return {"id": record_id}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create record")
 
-@router.get("/first_layer/{pre_id}")
-async def get_record(pre_id: int, db=Depends(get_db2)):
+@router.post("/first_layer/bulk")
+async def create_records_bulk(rows: List[dict], request: Request,
+                              chunk_size: int = Query(BULK_CHUNK, ge=1, le=MAX_BULK_CHUNK), db=Depends(get_db2)):
+    valid, errors = validate_rows(FirstLayerCreate, rows)
+    records = [record for _, record in valid]
     try:
-        query = FirstLayer.__table__.select().where(FirstLayer.pre_id == pre_id)
-        result = await db.execute(query)
+        # pre_id is assigned by the database, as in create_record
+        ids = await bulk_insert(db, FirstLayer.__table__, FirstLayer.pre_id,
+                                [record.dict(exclude={"pre_id"}) for record in records], chunk_size)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to create records")
+    for record_id, record in zip(ids, records):
+        request.app.state.search_index["first_layer"].add(record_id, record.word, record.meaning,
+                                                          record.deepl_translation)
+        request.app.state.autocomplete["first"].add(record_id, record.word, record.is_private)
+    return {"ids": ids, "errors": errors}
+
+@router.delete("/first_layer/bulk")
+async def delete_records_bulk(ids: List[int], request: Request,
+                              chunk_size: int = Query(BULK_CHUNK, ge=1, le=MAX_BULK_CHUNK), db=Depends(get_db2)):
+    try:
+        deleted = await bulk_delete(db, FirstLayer.__table__, FirstLayer.pre_id, ids, chunk_size)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to delete records")
+    invalidate(*(f"first_layer:{row_id}" for row_id in deleted))
+    for row_id in deleted:
+        request.app.state.search_index["first_layer"].remove(row_id)
+    request.app.state.autocomplete["first"].remove_many(deleted)
+    found = set(deleted)
+    return {"deleted": deleted, "missing": [row_id for row_id in dict.fromkeys(ids) if row_id not in found]}
+
+@router.post("/first_layer/promote")
+async def promote_records(request: Request, dry_run: bool = False, chunk_size: int = Query(PROMOTE_CHUNK, ge=1),
+                          db=Depends(get_db2)):
+    # Moves every approved (who_agreed > 0) row to core_layer; dry_run only
+    # counts them
+    def on_chunk(pre_ids, core_rows):
+        invalidate(*(f"first_layer:{pre_id}" for pre_id in pre_ids))
+        for pre_id in pre_ids:
+            request.app.state.search_index["first_layer"].remove(pre_id)
+        request.app.state.autocomplete["first"].remove_many(pre_ids)
+        for row in core_rows:
+            request.app.state.search_index["core_layer"].add(row.id, row.word, row.meaning, row.deepl_translation,
+                                                             row.additional_translation)
+            request.app.state.autocomplete["core"].add(row.id, row.word, row.is_private)
+
+    try:
+        return await promote(db, chunk_size, dry_run, on_chunk)
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to promote records")
+
+@router.get("/first_layer/{pre_id}")
+async def get_record(pre_id: int, db=Depends(get_read_db)):
+    async def load():
+        result = await db.execute(SELECT_FIRST, {"row_id": pre_id})
         record = result.fetchone()
+        return record._asdict() if record else None
 
+    try:
+        record = await cached(f"first_layer:{pre_id}", load)
         if record is None:
             raise HTTPException(status_code=404, detail="Record not found")
-        return record._asdict()
+        return record
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to fetch record")
 
 @router.put("/first_layer/{pre_id}")
-async def update_record(pre_id: int, updated_record: FirstLayerCreate, db=Depends(get_db2)):
+async def update_record(pre_id: int, updated_record: FirstLayerCreate, request: Request, db=Depends(get_db2)):
     try:
-        query = FirstLayer.__table__.update().where(FirstLayer.pre_id == pre_id).values(**updated_record.dict())
-        await db.execute(query)
+        await db.execute(UPDATE_FIRST, {"row_id": pre_id, **updated_record.dict()})
         await db.commit()
+        invalidate(f"first_layer:{pre_id}")
+        request.app.state.search_index["first_layer"].add(pre_id, updated_record.word, updated_record.meaning,
+                                                          updated_record.deepl_translation)
+        request.app.state.autocomplete["first"].add(pre_id, updated_record.word, updated_record.is_private)
         return {"message": "Record updated successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update record")
 
 @router.delete("/first_layer/{pre_id}")
-async def delete_record(pre_id: int, db=Depends(get_db2)):
+async def delete_record(pre_id: int, request: Request, db=Depends(get_db2)):
     try:
-        query = FirstLayer.__table__.delete().where(FirstLayer.pre_id == pre_id)
-        await db.execute(query)
+        await db.execute(DELETE_FIRST, {"row_id": pre_id})
         await db.commit()
+        invalidate(f"first_layer:{pre_id}")
+        request.app.state.search_index["first_layer"].remove(pre_id)
+        request.app.state.autocomplete["first"].remove(pre_id)
         return {"message": "Record deleted successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete record")
 
 @router.get("/first_layer/")
-async def get_all_records(db=Depends(get_db2)):
+async def get_all_records(after_id: int = 0, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          stream: bool = False, db=Depends(get_read_db)):
+    query = FirstLayer.__table__.select().where(FirstLayer.pre_id > after_id).order_by(FirstLayer.pre_id)
+    if stream:
+        return ndjson_response(query, db.bind)
     try:
-        query = FirstLayer.__table__.select()
-        result = await db.execute(query)
+        result = await db.execute(query.limit(limit))
         records = result.fetchall()
         return [record._asdict() for record in records]
     except SQLAlchemyError as e:
@@ -168,8 +387,12 @@ async def get_all_records(db=Depends(get_db2)):
 
 ## Search functionality ##
 @router.get("/first_layer_search")
-async def search_first_layer(keyword: str, db=Depends(get_db2)) -> List[str]:
+async def search_first_layer(keyword: str, request: Request, db=Depends(get_read_db)) -> List[str]:
     try:
+        rows = await infix_search(db, "first_layer", request.app.state.search_index["first_layer"], keyword)
+        if rows is not None:
+            return [row.word for row in rows]
+        # Keywords shorter than a trigram fall back to scanning
         query = text(
             "SELECT * FROM first_layer WHERE word LIKE :keyword OR meaning LIKE :keyword OR deepl_translation LIKE :keyword"
         ).params(keyword=f"%{keyword}%")
@@ -179,66 +402,119 @@ async def search_first_layer(keyword: str, db=Depends(get_db2)) -> List[str]:
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to perform search")
 
+@router.get("/first_layer_fulltext")
+async def fulltext_first_layer(q: str, mode: str = "natural", limit: int = Query(20, ge=1, le=100),
+                               db=Depends(get_read_db)):
+    # Ranked by relevance, a match in word counting more than one in meaning
+    if mode not in MODES:
+        raise HTTPException(status_code=400, detail="mode must be one of natural, boolean")
+    try:
+        return await fulltext_search(db, "first_layer", q, mode, limit)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to perform search")
+
 ## CORE LAYER STUFF - DB CRUD ##
 @router.post("/core_layer/")
-async def create_record(record: CoreLayerCreate, db=Depends(get_db2)):
-    try:
-        query = CoreLayer.__table__.insert().values(
-            word=record.word,
-            meaning=record.meaning,
-            is_private=record.is_private,
-            who_added=record.who_added,
-            who_agreed=record.who_agreed,
-            deepl_translation=record.deepl_translation,
-            additional_translation=record.additional_translation
-        )
-        result = await db.execute(query)
+async def create_record(record: CoreLayerCreate, request: Request, db=Depends(get_db2)):
+    try:
+        result = await db.execute(INSERT_CORE, record.dict())
         record_id = result.inserted_primary_key[0]
         await db.commit()
+        request.app.state.search_index["core_layer"].add(record_id, record.word, record.meaning,
+                                                         record.deepl_translation, record.additional_translation)
+        request.app.state.autocomplete["core"].add(record_id, record.word, record.is_private)
         return {"id": record_id}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to create record")
 
-@router.get("/core_layer/{record_id}")
-async def get_record(record_id: int, db=Depends(get_db2)):
+@router.post("/core_layer/bulk")
+async def create_records_bulk(rows: List[dict], request: Request,
+                              chunk_size: int = Query(BULK_CHUNK, ge=1, le=MAX_BULK_CHUNK), db=Depends(get_db2)):
+    valid, errors = validate_rows(CoreLayerCreate, rows)
+    records = [record for _, record in valid]
     try:
-        query = CoreLayer.__table__.select().where(CoreLayer.id == record_id)
-        result = await db.execute(query)
+        ids = await bulk_insert(db, CoreLayer.__table__, CoreLayer.id, [record.dict() for record in records],
+                                chunk_size)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to create records")
+    for record_id, record in zip(ids, records):
+        request.app.state.search_index["core_layer"].add(record_id, record.word, record.meaning,
+                                                         record.deepl_translation, record.additional_translation)
+        request.app.state.autocomplete["core"].add(record_id, record.word, record.is_private)
+    return {"ids": ids, "errors": errors}
+
+@router.delete("/core_layer/bulk")
+async def delete_records_bulk(ids: List[int], request: Request,
+                              chunk_size: int = Query(BULK_CHUNK, ge=1, le=MAX_BULK_CHUNK), db=Depends(get_db2)):
+    try:
+        deleted = await bulk_delete(db, CoreLayer.__table__, CoreLayer.id, ids, chunk_size)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to delete records")
+    invalidate(*(f"core_layer:{row_id}" for row_id in deleted))
+    for row_id in deleted:
+        request.app.state.search_index["core_layer"].remove(row_id)
+    request.app.state.autocomplete["core"].remove_many(deleted)
+    found = set(deleted)
+    return {"deleted": deleted, "missing": [row_id for row_id in dict.fromkeys(ids) if row_id not in found]}
+
+@router.get("/core_layer/{record_id}")
+async def get_record(record_id: int, db=Depends(get_read_db)):
+    async def load():
+        result = await db.execute(SELECT_CORE, {"row_id": record_id})
         record = result.fetchone()
+        return record._asdict() if record else None
+
+    try:
+        record = await cached(f"core_layer:{record_id}", load)
         if record is None:
             raise HTTPException(status_code=404, detail="Record not found")
-        return record._asdict()
+        return record
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to fetch record")
 
 @router.put("/core_layer/{record_id}")
-async def update_record(record_id: int, updated_record: CoreLayerCreate, db=Depends(get_db2)):
+async def update_record(record_id: int, updated_record: CoreLayerCreate, request: Request, db=Depends(get_db2)):
     try:
-        query = CoreLayer.__table__.update().where(CoreLayer.id == record_id).values(**updated_record.dict())
-        await db.execute(query)
+        await db.execute(UPDATE_CORE, {"row_id": record_id, **updated_record.dict()})
         await db.commit()
+        invalidate(f"core_layer:{record_id}")
+        request.app.state.search_index["core_layer"].add(record_id, updated_record.word, updated_record.meaning,
+                                                         updated_record.deepl_translation,
+                                                         updated_record.additional_translation)
+        request.app.state.autocomplete["core"].add(record_id, updated_record.word, updated_record.is_private)
         return {"message": "Record updated successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to update record")
 
 @router.delete("/core_layer/{record_id}")
-async def delete_record(record_id: int, db=Depends(get_db2)):
+async def delete_record(record_id: int, request: Request, db=Depends(get_db2)):
     try:
-        query = CoreLayer.__table__.delete().where(CoreLayer.id == record_id)
-        await db.execute(query)
+        await db.execute(DELETE_CORE, {"row_id": record_id})
         await db.commit()
+        invalidate(f"core_layer:{record_id}")
+        request.app.state.search_index["core_layer"].remove(record_id)
+        request.app.state.autocomplete["core"].remove(record_id)
         return {"message": "Record deleted successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete record")
 
 @router.get("/core_layer/")
-async def get_all_records(db=Depends(get_db2)):
+async def get_all_records(after_id: int = 0, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          stream: bool = False, db=Depends(get_read_db)):
+    query = CoreLayer.__table__.select().where(CoreLayer.id > after_id).order_by(CoreLayer.id)
+    if stream:
+        return ndjson_response(query, db.bind)
     try:
-        query = CoreLayer.__table__.select()
-        result = await db.execute(query)
+        result = await db.execute(query.limit(limit))
         records = result.fetchall()
         return [record._asdict() for record in records]
     except SQLAlchemyError as e:
@@ -246,8 +522,12 @@ async def get_all_records(db=Depends(get_db2)):
 
 ## Search functionality ##
 @router.get("/core_layer_search")
-async def search_core_layer(keyword: str, db=Depends(get_db2)) -> List[str]:
+async def search_core_layer(keyword: str, request: Request, db=Depends(get_read_db)) -> List[str]:
     try:
+        rows = await infix_search(db, "core_layer", request.app.state.search_index["core_layer"], keyword)
+        if rows is not None:
+            return [row.word for row in rows]
+        # Keywords shorter than a trigram fall back to scanning
         query = text(
             "SELECT * FROM core_layer WHERE word LIKE :keyword OR meaning LIKE :keyword OR deepl_translation LIKE :keyword OR additional_translation LIKE :keyword"
         ).params(keyword=f"%{keyword}%")
@@ -257,12 +537,52 @@ async def search_core_layer(keyword: str, db=Depends(get_db2)) -> List[str]:
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to perform search")
 
+@router.get("/core_layer_fulltext")
+async def fulltext_core_layer(q: str, mode: str = "natural", limit: int = Query(20, ge=1, le=100),
+                              db=Depends(get_read_db)):
+    # Ranked by relevance, a match in word counting more than one in meaning
+    if mode not in MODES:
+        raise HTTPException(status_code=400, detail="mode must be one of natural, boolean")
+    try:
+        return await fulltext_search(db, "core_layer", q, mode, limit)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to perform search")
+
+## Autocomplete ##
+@router.get("/autocomplete")
+async def autocomplete(prefix: str, request: Request, layer: str = "all",
+                       limit: int = Query(10, ge=1, le=100), db=Depends(get_read_db)) -> List[str]:
+    # Public words only, until requests carry an authenticated user
+    indexes = request.app.state.autocomplete
+    if layer == "all":
+        layers = list(indexes)
+    elif layer in indexes:
+        layers = [layer]
+    else:
+        raise HTTPException(status_code=400, detail="layer must be one of core, first, all")
+    try:
+        results = [await verified_complete(db, name, indexes[name], prefix, limit) for name in layers]
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to complete prefix")
+    return merge_completions(results, limit)
+
+## Connection pool ##
+@router.get("/pool_stats")
+async def get_pool_stats():
+    return pool_status()
+
+## Record cache ##
+@router.get("/cache_stats")
+async def get_cache_stats():
+    return cache_stats.as_dict()
+
 ## DEEPL KEYS STUFF - CRUD DB ##
 @router.post("/deepl_keys/")
 async def create_deepl_key(key: str, db=Depends(get_db2)):
     try:
-        query = DeeplKey.__table__.insert().values(key=key)
-        result = await db.execute(query)
+        result = await db.execute(INSERT_DEEPL_KEY, {"key": key})
         key_id = result.inserted_primary_key[0]
         await db.commit()
         return {"id": key_id}
@@ -271,23 +591,26 @@ async def create_deepl_key(key: str, db=Depends(get_db2)):
         raise HTTPException(status_code=500, detail="Failed to create deepl key")
 
 @router.get("/deepl_keys/{key_id}")
-async def read_deepl_key(key_id: int, db=Depends(get_db2)):
-    try:
-        query = DeeplKey.__table__.select().where(DeeplKey.id == key_id)
-        result = await db.execute(query)
+async def read_deepl_key(key_id: int, db=Depends(get_read_db)):
+    async def load():
+        result = await db.execute(SELECT_DEEPL_KEY, {"row_id": key_id})
         db_key = result.fetchone()
+        return db_key._asdict() if db_key else None
+
+    try:
+        db_key = await cached(f"deepl_keys:{key_id}", load)
         if db_key is None:
             raise HTTPException(status_code=404, detail="Key not found")
-        return db_key._asdict()
+        return db_key
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to fetch deepl key")
 
 @router.put("/deepl_keys/{key_id}")
 async def update_deepl_key(key_id: int, key: str, accessible: bool, db=Depends(get_db2)):
     try:
-        query = DeeplKey.__table__.update().where(DeeplKey.id == key_id).values(key=key, accessible=accessible)
-        await db.execute(query)
+        await db.execute(UPDATE_DEEPL_KEY, {"row_id": key_id, "key": key, "accessible": accessible})
         await db.commit()
+        invalidate(f"deepl_keys:{key_id}")
         return {"message": "Deepl key updated successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
@@ -296,20 +619,93 @@ async def update_deepl_key(key_id: int, key: str, accessible: bool, db=Depends(g
 @router.delete("/deepl_keys/{key_id}")
 async def delete_deepl_key(key_id: int, db=Depends(get_db2)):
     try:
-        query = DeeplKey.__table__.delete().where(DeeplKey.id == key_id)
-        await db.execute(query)
+        await db.execute(DELETE_DEEPL_KEY, {"row_id": key_id})
         await db.commit()
+        invalidate(f"deepl_keys:{key_id}")
         return {"message": "Deepl key deleted successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Failed to delete deepl key")
 
 @router.get("/deepl_keys/")
-async def get_all_deepl_keys(db=Depends(get_db2)):
+async def get_all_deepl_keys(after_id: int = 0, limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                             stream: bool = False, db=Depends(get_read_db)):
+    query = DeeplKey.__table__.select().where(DeeplKey.id > after_id).order_by(DeeplKey.id)
+    if stream:
+        return ndjson_response(query, db.bind)
     try:
-        query = DeeplKey.__table__.select()
-        result = await db.execute(query)
+        result = await db.execute(query.limit(limit))
         keys = result.fetchall()
         return [key._asdict() for key in keys]
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail="Failed to fetch deepl keys")
+
+@router.get("/deepl_pool")
+async def get_deepl_pool(request: Request):
+    return {**request.app.state.key_pool.stats(), "batching": request.app.state.deepl_batcher.stats()}
+
+@router.post("/deepl_pool/refresh")
+async def refresh_deepl_pool(request: Request):
+    # Same as the periodic background refresh, run now
+    try:
+        await sync_key_pool(request.app.state.key_pool, request.app.state.deepl)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to refresh deepl keys")
+    return request.app.state.key_pool.stats()
+
+## Translation ##
+@router.post("/translate")
+async def translate_texts(body: TranslateRequest, request: Request, db=Depends(get_db2)) -> List[str]:
+    # Texts already translated for this language pair and glossary come
+    # from the translation cache; only the rest is sent to DeepL. For the
+    # core_layer language pair, known terms are resolved locally unless
+    # terms is "deepl" (whole texts with the synced glossary) or "off".
+    state = request.app.state
+    if body.terms not in TERM_MODES:
+        raise HTTPException(status_code=400, detail="terms must be one of local, deepl, off")
+    glossary, sync = state.glossary, state.glossary_sync
+    use_terms = body.terms != "off" and not body.glossary_id and glossary.applies(body.target_lang, body.source_lang)
+    if use_terms and body.terms == "deepl" and sync.version is None:
+        raise HTTPException(status_code=503, detail="Glossary is not synced to DeepL yet")
+    try:
+        if not use_terms:
+            return await translate_cached(db, state.translation_cache, state.deepl_batcher, body.texts,
+                                          body.target_lang, body.source_lang, body.glossary_id)
+        if body.terms == "deepl":
+            # DeepL needs the source language whenever a glossary is used
+            return await translate_cached(db, state.translation_cache, state.deepl_batcher, body.texts,
+                                          body.target_lang, glossary.source_lang, glossary=sync.name,
+                                          glossary_version=sync.version)
+        return await translate_resolved(db, state.translation_cache, state.deepl_batcher, glossary, body.texts,
+                                        body.target_lang, body.source_lang)
+    except KeysExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeeplError as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Failed to translate")
+
+@router.get("/translation_cache")
+async def get_translation_cache_stats(request: Request):
+    return request.app.state.translation_cache.stats()
+
+@router.get("/glossary")
+async def get_glossary_stats(request: Request):
+    return {**request.app.state.glossary.stats(), "sync": request.app.state.glossary_sync.stats()}
+
+@router.post("/glossary/sync")
+async def sync_glossary(request: Request):
+    # Same as the periodic background reload and sync, run now
+    try:
+        await refresh_glossary(request.app.state.glossary, request.app.state.glossary_sync)
+    except SQLAlchemyError as e:
+        raise HTTPException(status_code=500, detail="Failed to load glossary")
+    return {**request.app.state.glossary.stats(), "sync": request.app.state.glossary_sync.stats()}
+
+@router.get("/backfill")
+async def get_backfill_stats(request: Request):
+    backfill = getattr(request.app.state, "backfill", None)
+    if backfill is None:
+        raise HTTPException(status_code=404, detail="Translation backfill is not enabled")
+    return backfill.stats()
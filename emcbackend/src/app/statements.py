@@ -0,0 +1,30 @@
+# Hot-path CRUD statements, built once with bound parameters. Reusing the
+# same statement object skips rebuilding the Core construct on every request
+# and lets SQLAlchemy find the compiled form in its cache straight away.
+# UPDATEs take the new column values as execute() parameters, so the bound
+# key for the row id must not be a column name.
+from sqlalchemy import bindparam, select
+
+from app.models import DeeplKey, User, FirstLayer, CoreLayer
+from app.user_words import USER_WORD_LISTS
+
+
+def _crud(model, id_column):
+    table = model.__table__
+    return (
+        table.insert(),
+        table.select().where(id_column == bindparam("row_id")),
+        table.update().where(id_column == bindparam("row_id")),
+        table.delete().where(id_column == bindparam("row_id")),
+    )
+
+
+INSERT_USER, _, UPDATE_USER, DELETE_USER = _crud(User, User.id)
+# The legacy liked_words / to_learn strings are neither written nor served:
+# the lists are in user_words
+USER_COLUMNS = [column for column in User.__table__.columns if column.name not in USER_WORD_LISTS]
+USER_FIELDS = set(USER_WORD_LISTS)
+SELECT_USER = select(*USER_COLUMNS).where(User.id == bindparam("row_id"))
+INSERT_FIRST, SELECT_FIRST, UPDATE_FIRST, DELETE_FIRST = _crud(FirstLayer, FirstLayer.pre_id)
+INSERT_CORE, SELECT_CORE, UPDATE_CORE, DELETE_CORE = _crud(CoreLayer, CoreLayer.id)
+INSERT_DEEPL_KEY, SELECT_DEEPL_KEY, UPDATE_DEEPL_KEY, DELETE_DEEPL_KEY = _crud(DeeplKey, DeeplKey.id)
@@ -0,0 +1,21 @@
+import json
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+STREAM_CHUNK = 1000
+
+
+async def _ndjson_rows(query, bind):
+    # Uses its own session on the same engine as the request's, which is
+    # closed before the response body is sent
+    async with AsyncSession(bind) as db:
+        result = await db.stream(query.execution_options(yield_per=STREAM_CHUNK))
+        async for row in result:
+            yield json.dumps(row._asdict(), default=str) + "\n"
+
+
+def ndjson_response(query, bind):
+    # Server-side cursor, one JSON object per line: memory stays constant
+    # no matter how large the table is
+    return StreamingResponse(_ndjson_rows(query, bind), media_type="application/x-ndjson")
@@ -0,0 +1,112 @@
+import hashlib
+import os
+import unicodedata
+
+from sqlalchemy import select
+
+from app.db import LRUDict
+from app.models import Translation
+
+TRANSLATION_CACHE_SIZE = int(os.environ.get("TRANSLATION_CACHE_SIZE", "50000"))
+FETCH_CHUNK = 500
+
+
+def normalise_source(text):
+    # Case and accents can change a translation, so only Unicode forms and
+    # whitespace are folded
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(text, source_lang, target_lang, glossary_id):
+    parts = (normalise_source(text), (source_lang or "").upper(), target_lang.upper(), glossary_id or "")
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+class TranslationCache:
+    # In-memory LRU in front of the translations table. Entries do not
+    # expire: synced glossaries are edited in place, so their translations
+    # are keyed by glossary name and content version (see translate_cached).
+    def __init__(self, size=TRANSLATION_CACHE_SIZE):
+        self._memory = LRUDict(size)
+        self.memory_hits = 0
+        self.table_hits = 0
+        self.misses = 0
+
+    async def get_many(self, db, keys):
+        # Returns {key: translation} for the keys found in either tier
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._memory.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                found[key] = value
+        self.memory_hits += len(found)
+        for start in range(0, len(missing), FETCH_CHUNK):
+            query = select(Translation.key_hash, Translation.translation).where(
+                Translation.key_hash.in_(missing[start:start + FETCH_CHUNK]))
+            for key, value in (await db.execute(query)).fetchall():
+                self._memory[key] = value
+                found[key] = value
+                self.table_hits += 1
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, db, rows):
+        # rows are Translation column dicts; a key another worker stored in
+        # the meantime is skipped. The caller commits.
+        if not rows:
+            return
+        insert = Translation.__table__.insert()
+        dialect = db.bind.dialect.name
+        if dialect == "mysql":
+            insert = insert.prefix_with("IGNORE")
+        elif dialect == "sqlite":
+            insert = insert.prefix_with("OR IGNORE")
+        await db.execute(insert, rows)
+        for row in rows:
+            self._memory[row["key_hash"]] = row["translation"]
+
+    def stats(self):
+        lookups = self.memory_hits + self.table_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "table_hits": self.table_hits,
+            "misses": self.misses,
+            "hit_ratio": round((lookups - self.misses) / lookups, 4) if lookups else 0.0,
+            "memory_size": len(self._memory),
+            "memory_max_size": self._memory.maxsize,
+        }
+
+
+def cache_rows(pending, translations, target_lang, source_lang=None, glossary_id=None):
+    # Translation rows for put_many from {key: normalised text} and the
+    # translations in the same order
+    return [
+        {"key_hash": key, "source_text": text, "source_lang": (source_lang or "").upper(),
+         "target_lang": target_lang.upper(), "glossary_id": glossary_id or "", "translation": translation}
+        for (key, text), translation in zip(pending.items(), translations)
+    ]
+
+
+async def translate_cached(db, cache, batcher, texts, target_lang, source_lang=None, glossary_id=None,
+                           glossary=None, glossary_version=None):
+    # Sends DeepL only the distinct texts neither cache tier knows, through
+    # the micro-batcher; results come back in the order of texts. glossary
+    # is the name of a synced glossary at glossary_version.
+    cache_glossary = f"{glossary}:{glossary_version}" if glossary else glossary_id
+    keys = [cache_key(text, source_lang, target_lang, cache_glossary) for text in texts]
+    found = await cache.get_many(db, list(dict.fromkeys(keys)))
+    pending = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in pending:
+            pending[key] = normalise_source(text)
+    if pending:
+        translated = await batcher.translate_many(list(pending.values()), target_lang, source_lang, glossary_id,
+                                                  glossary)
+        rows = cache_rows(pending, translated, target_lang, source_lang, cache_glossary)
+        await cache.put_many(db, rows)
+        await db.commit()
+        found.update((row["key_hash"], row["translation"]) for row in rows)
+    return [found[key] for key in keys]
@@ -0,0 +1,85 @@
+from sqlalchemy import select
+
+from app.models import User, UserWord
+
+# Lists a word can be on; the value is stored in user_words.kind
+USER_WORD_LISTS = ("liked_words", "to_learn")
+WORD_CHUNK = 500
+
+
+def parse_words(text):
+    # The comma-separated liked_words / to_learn strings of UserCreate
+    return list(dict.fromkeys(word for word in (word.strip() for word in (text or "").split(",")) if word))
+
+
+def word_rows(user_id, user):
+    # user_words rows for a new user's liked_words and to_learn strings
+    return [{"user_id": user_id, "kind": kind, "word": word}
+            for kind in USER_WORD_LISTS for word in parse_words(getattr(user, kind))]
+
+
+async def add_words(db, user_id, kind, words):
+    # Inserts the words not already on the list; returns (added, existing)
+    words = list(dict.fromkeys(word for word in words if word))
+    existing = set()
+    for start in range(0, len(words), WORD_CHUNK):
+        chunk = words[start:start + WORD_CHUNK]
+        result = await db.execute(select(UserWord.word).where(
+            UserWord.user_id == user_id, UserWord.kind == kind, UserWord.word.in_(chunk)))
+        existing.update(result.scalars().all())
+    added = [word for word in words if word not in existing]
+    if added:
+        await db.execute(UserWord.__table__.insert(),
+                         [{"user_id": user_id, "kind": kind, "word": word} for word in added])
+    return added, [word for word in words if word in existing]
+
+
+async def remove_words(db, user_id, kind, words):
+    # Returns (removed, missing)
+    words = list(dict.fromkeys(words))
+    found = set()
+    for start in range(0, len(words), WORD_CHUNK):
+        chunk = words[start:start + WORD_CHUNK]
+        where = (UserWord.user_id == user_id, UserWord.kind == kind, UserWord.word.in_(chunk))
+        result = await db.execute(select(UserWord.word).where(*where))
+        chunk_found = set(result.scalars().all())
+        if chunk_found:
+            await db.execute(UserWord.__table__.delete().where(*where))
+        found.update(chunk_found)
+    return [word for word in words if word in found], [word for word in words if word not in found]
+
+
+async def set_words(db, user_id, kind, words):
+    # Makes the list hold exactly words; returns (added, removed)
+    words = list(dict.fromkeys(word for word in words if word))
+    result = await db.execute(select(UserWord.word).where(UserWord.user_id == user_id, UserWord.kind == kind))
+    keep = set(words)
+    stale = [word for word in result.scalars().all() if word not in keep]
+    removed, _ = await remove_words(db, user_id, kind, stale)
+    added, _ = await add_words(db, user_id, kind, words)
+    return added, removed
+
+
+async def list_words(db, user_id, kind, after, limit):
+    # One page of a user's list in word order, read off the primary key
+    query = (
+        select(UserWord.word, UserWord.added_at)
+        .where(UserWord.user_id == user_id, UserWord.kind == kind, UserWord.word > after)
+        .order_by(UserWord.word)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return [row._asdict() for row in result.fetchall()]
+
+
+async def users_with_word(db, kind, word, after_id, limit):
+    # Served by ix_user_words_word (kind, word, user_id)
+    query = (
+        select(User.id, User.username)
+        .join(UserWord, UserWord.user_id == User.id)
+        .where(UserWord.kind == kind, UserWord.word == word, UserWord.user_id > after_id)
+        .order_by(UserWord.user_id)
+        .limit(limit)
+    )
+    result = await db.execute(query)
+    return [row._asdict() for row in result.fetchall()]
@@ -0,0 +1,86 @@
+# Words per second through the DeepL path against the local mock server
+# (mock_deepl.py, started here on a free port), one request per word versus
+# the micro-batcher. Run from emcbackend/src:
+#   python -m benchmarks.bench_deepl [--words N] [--concurrency N] [--latency-ms N]
+import argparse
+import asyncio
+import socket
+import threading
+import time
+
+import uvicorn
+
+import app.deepl
+import mock_deepl
+from app.batcher import TranslationBatcher
+from app.deepl import make_client
+from app.keypool import KeyPool
+
+
+def start_mock(latency):
+    mock_deepl.LATENCY = latency
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(mock_deepl.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def unbatched(pool, client, words, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(word):
+        async with limit:
+            return (await pool.translate(client, [word], "DE"))[0]
+
+    return await asyncio.gather(*(one(word) for word in words))
+
+
+async def batched(batcher, words, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(word):
+        async with limit:
+            return await batcher.translate(word, "DE")
+
+    return await asyncio.gather(*(one(word) for word in words))
+
+
+async def run(args):
+    words = [f"word{i}" for i in range(args.words)]
+    async with make_client() as client:
+        pool = KeyPool()
+        pool.set_keys([(1, "bench-key")])
+        start = time.perf_counter()
+        results = await unbatched(pool, client, words, args.concurrency)
+        seconds = time.perf_counter() - start
+        assert results == [f"de:{word}" for word in words]
+        print(f"unbatched  {len(words) / seconds:10.0f} words/s  {len(words)} requests")
+
+        batcher = TranslationBatcher(pool, client)
+        start = time.perf_counter()
+        results = await batched(batcher, words, args.concurrency)
+        seconds = time.perf_counter() - start
+        assert results == [f"de:{word}" for word in words]
+        print(f"batched    {len(words) / seconds:10.0f} words/s  {batcher.requests} requests")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DeepL batching throughput against the mock server")
+    parser.add_argument("--words", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50, help="simulated DeepL round trip")
+    args = parser.parse_args()
+    server, url = start_mock(args.latency_ms / 1000)
+    app.deepl.DEEPL_API_URL = url
+    try:
+        asyncio.run(run(args))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
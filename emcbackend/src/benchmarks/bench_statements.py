@@ -0,0 +1,71 @@
+# Per-call cost of the hot CRUD statements: building the Core statement in
+# the handler (as before app/statements.py), reusing the prebuilt one, and a
+# lambda statement. Uses an in-memory SQLite database so the numbers are
+# dominated by SQLAlchemy rather than the server. Run from emcbackend/src:
+#   python -m benchmarks.bench_statements [--calls N] [--rows N]
+import argparse
+import time
+
+from sqlalchemy import create_engine, lambda_stmt
+
+from app.models import Base, CoreLayer
+from app.statements import SELECT_CORE, UPDATE_CORE
+
+ROW = {"word": "word", "meaning": "meaning", "is_private": False, "who_added": 1, "who_agreed": 1,
+       "deepl_translation": "translation", "additional_translation": "additional"}
+
+
+def built_select(conn, row_id):
+    return conn.execute(CoreLayer.__table__.select().where(CoreLayer.id == row_id)).fetchone()
+
+
+def prebuilt_select(conn, row_id):
+    return conn.execute(SELECT_CORE, {"row_id": row_id}).fetchone()
+
+
+def lambda_select(conn, row_id):
+    return conn.execute(lambda_stmt(lambda: CoreLayer.__table__.select().where(CoreLayer.id == row_id))).fetchone()
+
+
+def built_update(conn, row_id):
+    conn.execute(CoreLayer.__table__.update().where(CoreLayer.id == row_id).values(**ROW))
+
+
+def prebuilt_update(conn, row_id):
+    conn.execute(UPDATE_CORE, {"row_id": row_id, **ROW})
+
+
+CASES = {
+    "select/built": built_select,
+    "select/prebuilt": prebuilt_select,
+    "select/lambda": lambda_select,
+    "update/built": built_update,
+    "update/prebuilt": prebuilt_update,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=1000)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(CoreLayer.__table__.insert(), [ROW] * args.rows)
+
+    with engine.connect() as conn:
+        for name, case in CASES.items():
+            for row_id in range(1, 101):
+                case(conn, row_id)
+            start = time.perf_counter()
+            for i in range(args.calls):
+                case(conn, i % args.rows + 1)
+            per_call = (time.perf_counter() - start) / args.calls
+            print(f"{name:16} {per_call * 1e6:8.1f} us/call")
+        conn.rollback()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,17 @@
+import asyncio
+import contextlib
+
 from fastapi import FastAPI
 from app.routes import router
+from app.db import SessionLocal, READ_PRIMARY_COOKIE, REPLICA_LAG, replica_engines
+from app.ngram import INDEX_REFRESH_INTERVAL, build_indexes
+from app.autocomplete import build_autocomplete
+from app.deepl import make_client
+from app.keypool import KeyPool, follow_key_pool
+from app.translation_cache import TranslationCache
+from app.batcher import TranslationBatcher
+from app.backfill import BACKFILL_ENABLED, Backfill
+from app.glossary import Glossary, GlossarySync, follow_glossary
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
@@ -17,14 +29,85 @@ app.add_middleware(
         allow_headers=["*"],
     )
 
+@app.middleware("http")
+async def pin_reads_after_write(request, call_next):
+    # Read-your-writes: after a successful write the client's reads go to
+    # the primary until the replicas have had time to catch up
+    response = await call_next(request)
+    if replica_engines and request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+        response.set_cookie(READ_PRIMARY_COOKIE, "1", max_age=REPLICA_LAG, httponly=True)
+    return response
+
+async def refresh_indexes():
+    # Swaps in freshly built indexes, so writes made by other workers, the
+    # promote and backfill jobs or plain SQL show up within the interval.
+    # Until then /autocomplete re-checks its candidates against the table.
+    while True:
+        await asyncio.sleep(INDEX_REFRESH_INTERVAL)
+        try:
+            async with SessionLocal() as db:
+                search_index = await build_indexes(db)
+                autocomplete = await build_autocomplete(db)
+            app.state.search_index, app.state.autocomplete = search_index, autocomplete
+        except Exception as e:
+            print(f"Search index rebuild failed: {e}")
+
 @app.on_event("startup")
 async def startup_event():
-    ## todo: do something about the trie, where to store it at runtime
+    # Build the in-memory substring indexes used by the *_search routes
+    # and the per-layer prefix tries used by /autocomplete
+    db = SessionLocal()
+    try:
+        app.state.search_index = await build_indexes(db)
+        app.state.autocomplete = await build_autocomplete(db)
+        app.state.key_pool = KeyPool()
+        await app.state.key_pool.load(db)
+        app.state.glossary = Glossary()
+        await app.state.glossary.load(db)
+    finally:
+        await db.close()
+
+    # Rebuilt periodically to pick up writes made outside this process
+    app.state.index_refresh = asyncio.create_task(refresh_indexes())
+
+    # DeepL quota is refreshed in the background; revoked keys are retired
+    app.state.deepl = make_client()
+    app.state.translation_cache = TranslationCache()
+    app.state.deepl_batcher = TranslationBatcher(app.state.key_pool, app.state.deepl)
+    app.state.key_pool_sync = asyncio.create_task(follow_key_pool(app.state.key_pool, app.state.deepl))
+    # Only the worker holding the glossary lease writes to DeepL
+    app.state.glossary_sync = GlossarySync(app.state.glossary, app.state.key_pool, app.state.deepl)
+    app.state.glossary_follow = asyncio.create_task(follow_glossary(app.state.glossary, app.state.glossary_sync))
+
+    # Missing first_layer translations are filled in while live traffic
+    # allows, by whichever worker holds the backfill lease
+    if BACKFILL_ENABLED:
+        def reindex(rows):
+            for pre_id, word, meaning, translation in rows:
+                app.state.search_index["first_layer"].add(pre_id, word, meaning, translation)
+
+        app.state.backfill = Backfill(app.state.key_pool, app.state.deepl, app.state.translation_cache,
+                                      live=app.state.deepl_batcher, on_page=reindex)
+        app.state.backfill_task = asyncio.create_task(app.state.backfill.run())
 
-    # Save the trie to a global variable
     print('WAKE THE FUCK UP SAMURAI, WE HAVE A CITY TO BURN')
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.index_refresh.cancel()
+    app.state.key_pool_sync.cancel()
+    # Waited for so their leases are released for another worker to take
+    app.state.glossary_follow.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+        await app.state.glossary_follow
+    if BACKFILL_ENABLED:
+        app.state.backfill_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await app.state.backfill_task
+    await app.state.deepl.aclose()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
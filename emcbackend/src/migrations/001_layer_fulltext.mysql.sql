@@ -0,0 +1,13 @@
+-- FULLTEXT indexes for /first_layer_fulltext and /core_layer_fulltext (see
+-- app/fulltext.py). MATCH() needs an index on exactly the columns it names:
+-- the combined index finds rows, the single-column ones weight word above
+-- meaning. InnoDB ignores words shorter than innodb_ft_min_token_size (3).
+ALTER TABLE first_layer
+    ADD FULLTEXT INDEX ft_first_layer_all (word, meaning, deepl_translation),
+    ADD FULLTEXT INDEX ft_first_layer_word (word),
+    ADD FULLTEXT INDEX ft_first_layer_meaning (meaning);
+
+ALTER TABLE core_layer
+    ADD FULLTEXT INDEX ft_core_layer_all (word, meaning, deepl_translation, additional_translation),
+    ADD FULLTEXT INDEX ft_core_layer_word (word),
+    ADD FULLTEXT INDEX ft_core_layer_meaning (meaning);
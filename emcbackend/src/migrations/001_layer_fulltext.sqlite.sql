@@ -0,0 +1,50 @@
+-- SQLite equivalent of 001_layer_fulltext.mysql.sql for local databases:
+-- external-content FTS5 tables kept in sync by triggers. Weighting is done
+-- at query time with bm25().
+CREATE VIRTUAL TABLE IF NOT EXISTS first_layer_fts USING fts5(
+    word, meaning, deepl_translation,
+    content='first_layer', content_rowid='pre_id'
+);
+
+CREATE TRIGGER IF NOT EXISTS first_layer_fts_insert AFTER INSERT ON first_layer BEGIN
+    INSERT INTO first_layer_fts(rowid, word, meaning, deepl_translation)
+    VALUES (new.pre_id, new.word, new.meaning, new.deepl_translation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS first_layer_fts_delete AFTER DELETE ON first_layer BEGIN
+    INSERT INTO first_layer_fts(first_layer_fts, rowid, word, meaning, deepl_translation)
+    VALUES ('delete', old.pre_id, old.word, old.meaning, old.deepl_translation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS first_layer_fts_update AFTER UPDATE ON first_layer BEGIN
+    INSERT INTO first_layer_fts(first_layer_fts, rowid, word, meaning, deepl_translation)
+    VALUES ('delete', old.pre_id, old.word, old.meaning, old.deepl_translation);
+    INSERT INTO first_layer_fts(rowid, word, meaning, deepl_translation)
+    VALUES (new.pre_id, new.word, new.meaning, new.deepl_translation);
+END;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS core_layer_fts USING fts5(
+    word, meaning, deepl_translation, additional_translation,
+    content='core_layer', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS core_layer_fts_insert AFTER INSERT ON core_layer BEGIN
+    INSERT INTO core_layer_fts(rowid, word, meaning, deepl_translation, additional_translation)
+    VALUES (new.id, new.word, new.meaning, new.deepl_translation, new.additional_translation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS core_layer_fts_delete AFTER DELETE ON core_layer BEGIN
+    INSERT INTO core_layer_fts(core_layer_fts, rowid, word, meaning, deepl_translation, additional_translation)
+    VALUES ('delete', old.id, old.word, old.meaning, old.deepl_translation, old.additional_translation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS core_layer_fts_update AFTER UPDATE ON core_layer BEGIN
+    INSERT INTO core_layer_fts(core_layer_fts, rowid, word, meaning, deepl_translation, additional_translation)
+    VALUES ('delete', old.id, old.word, old.meaning, old.deepl_translation, old.additional_translation);
+    INSERT INTO core_layer_fts(rowid, word, meaning, deepl_translation, additional_translation)
+    VALUES (new.id, new.word, new.meaning, new.deepl_translation, new.additional_translation);
+END;
+
+-- Index rows that existed before the tables were created
+INSERT INTO first_layer_fts(first_layer_fts) VALUES ('rebuild');
+INSERT INTO core_layer_fts(core_layer_fts) VALUES ('rebuild');
@@ -0,0 +1,13 @@
+-- One row per word on a user's liked_words / to_learn list (app/models.py
+-- UserWord). The primary key pages a user's list in word order; the
+-- secondary index answers "which users have word X". Copy the existing
+-- strings afterwards with: python -m migrations.backfill_user_words
+CREATE TABLE IF NOT EXISTS user_words (
+    user_id INT NOT NULL,
+    kind VARCHAR(16) NOT NULL,
+    word VARCHAR(255) NOT NULL,
+    added_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, kind, word),
+    INDEX ix_user_words_word (kind, word, user_id),
+    CONSTRAINT fk_user_words_user FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE
+);
@@ -0,0 +1,12 @@
+-- Persistent tier of the translation cache (app/translation_cache.py).
+-- key_hash is sha256 over the normalised source text, language pair and
+-- glossary id.
+CREATE TABLE IF NOT EXISTS translations (
+    key_hash CHAR(64) NOT NULL PRIMARY KEY,
+    source_text TEXT NOT NULL,
+    source_lang VARCHAR(8) NOT NULL,
+    target_lang VARCHAR(8) NOT NULL,
+    glossary_id VARCHAR(64) NOT NULL,
+    translation TEXT NOT NULL,
+    created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,7 @@
+-- Progress of background workers; app/backfill.py keeps the last
+-- first_layer pre_id it translated under "first_layer_translation".
+CREATE TABLE IF NOT EXISTS worker_checkpoints (
+    name VARCHAR(64) NOT NULL PRIMARY KEY,
+    position INT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
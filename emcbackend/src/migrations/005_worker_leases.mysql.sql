@@ -0,0 +1,5 @@
+-- Only one process at a time runs a worker: the one holding the lease on
+-- its checkpoint row (see acquire_lease in app/backfill.py).
+ALTER TABLE worker_checkpoints
+    ADD COLUMN owner VARCHAR(64) NULL,
+    ADD COLUMN lease_until DATETIME NULL;
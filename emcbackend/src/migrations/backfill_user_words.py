@@ -0,0 +1,29 @@
+# Copies the comma-separated users.liked_words / users.to_learn strings into
+# user_words. Safe to re-run: words already on a list are skipped. Run from
+# emcbackend/src: python -m migrations.backfill_user_words
+import asyncio
+
+from sqlalchemy import select
+
+from app.db import SessionLocal
+from app.models import User
+from app.user_words import USER_WORD_LISTS, add_words, parse_words
+
+FETCH_CHUNK = 1000
+
+
+async def main():
+    async with SessionLocal() as db:
+        users = (await db.execute(select(User.id, User.liked_words, User.to_learn))).fetchall()
+        copied = 0
+        for start in range(0, len(users), FETCH_CHUNK):
+            for user in users[start:start + FETCH_CHUNK]:
+                for kind in USER_WORD_LISTS:
+                    added, _ = await add_words(db, user.id, kind, parse_words(getattr(user, kind)))
+                    copied += len(added)
+            await db.commit()
+        print(f"copied {copied} words for {len(users)} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
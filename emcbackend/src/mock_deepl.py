@@ -0,0 +1,136 @@
+# Stand-in for the DeepL API in development and tests. Every key is
+# accepted except ones starting with "invalid"; each gets MOCK_DEEPL_LIMIT
+# characters and translations are the source text prefixed with the
+# target language, or the glossary entry when a glossary holds the whole
+# text. MOCK_DEEPL_LATENCY_MS adds a fixed delay per request.
+# Run: python -m mock_deepl [--port 8090], then start the backend with
+# DEEPL_API_URL=http://localhost:8090
+import argparse
+import asyncio
+import os
+import uuid
+
+from fastapi import FastAPI, Header, HTTPException, Request
+
+LIMIT = int(os.environ.get("MOCK_DEEPL_LIMIT", "500000"))
+LATENCY = float(os.environ.get("MOCK_DEEPL_LATENCY_MS", "0")) / 1000
+
+app = FastAPI()
+app.state.usage = {}
+app.state.glossaries = {}  # glossary id -> {"key", "name", "dictionaries": {(source, target): entries}}
+
+
+def _key(authorization):
+    key = (authorization or "").removeprefix("DeepL-Auth-Key ").strip()
+    if not key or key.startswith("invalid"):
+        raise HTTPException(status_code=403, detail="Authorization failed")
+    app.state.usage.setdefault(key, [0, LIMIT])
+    return key
+
+
+@app.get("/v2/usage")
+async def usage(authorization: str = Header(None)):
+    used, limit = app.state.usage[_key(authorization)]
+    return {"character_count": used, "character_limit": limit}
+
+
+@app.post("/v2/translate")
+async def translate(request: Request, authorization: str = Header(None)):
+    key = _key(authorization)
+    body = await request.json()
+    await asyncio.sleep(LATENCY)
+    texts = body["text"]
+    chars = sum(len(text) for text in texts)
+    used, limit = app.state.usage[key]
+    if used + chars > limit:
+        raise HTTPException(status_code=456, detail="Quota exceeded")
+    app.state.usage[key][0] += chars
+    target = body["target_lang"].lower()
+    entries = {}
+    if body.get("glossary_id"):
+        source = body.get("source_lang", "EN").lower()
+        entries = _glossary(key, body["glossary_id"])["dictionaries"].get((source, target), {})
+    return {"translations": [{"detected_source_language": body.get("source_lang", "EN"),
+                              "text": entries.get(text, f"{target}:{text}")} for text in texts]}
+
+
+def _glossary(key, glossary_id):
+    glossary = app.state.glossaries.get(glossary_id)
+    if glossary is None or glossary["key"] != key:
+        raise HTTPException(status_code=404, detail="Glossary not found")
+    return glossary
+
+
+def _entries(dictionary):
+    entries = {}
+    for line in dictionary["entries"].splitlines():
+        source, _, target = line.partition("\t")
+        entries[source] = target
+    return (dictionary["source_lang"], dictionary["target_lang"]), entries
+
+
+def _info(glossary_id, glossary):
+    return {"glossary_id": glossary_id, "name": glossary["name"],
+            "dictionaries": [{"source_lang": source, "target_lang": target, "entry_count": len(entries)}
+                             for (source, target), entries in glossary["dictionaries"].items()]}
+
+
+@app.get("/v3/glossaries")
+async def list_glossaries(authorization: str = Header(None)):
+    key = _key(authorization)
+    return {"glossaries": [_info(glossary_id, glossary) for glossary_id, glossary in app.state.glossaries.items()
+                           if glossary["key"] == key]}
+
+
+@app.post("/v3/glossaries")
+async def create_glossary(request: Request, authorization: str = Header(None)):
+    key = _key(authorization)
+    body = await request.json()
+    glossary_id = str(uuid.uuid4())
+    app.state.glossaries[glossary_id] = {"key": key, "name": body["name"],
+                                         "dictionaries": dict(_entries(d) for d in body["dictionaries"])}
+    return _info(glossary_id, app.state.glossaries[glossary_id])
+
+
+@app.patch("/v3/glossaries/{glossary_id}")
+async def merge_glossary(glossary_id: str, request: Request, authorization: str = Header(None)):
+    glossary = _glossary(_key(authorization), glossary_id)
+    for dictionary in (await request.json()).get("dictionaries", []):
+        pair, entries = _entries(dictionary)
+        glossary["dictionaries"].setdefault(pair, {}).update(entries)
+    return _info(glossary_id, glossary)
+
+
+@app.put("/v3/glossaries/{glossary_id}/dictionaries")
+async def replace_dictionary(glossary_id: str, request: Request, authorization: str = Header(None)):
+    glossary = _glossary(_key(authorization), glossary_id)
+    pair, entries = _entries(await request.json())
+    glossary["dictionaries"][pair] = entries
+    return {"source_lang": pair[0], "target_lang": pair[1], "entry_count": len(entries)}
+
+
+@app.get("/v3/glossaries/{glossary_id}/entries")
+async def get_entries(glossary_id: str, source_lang: str, target_lang: str, authorization: str = Header(None)):
+    glossary = _glossary(_key(authorization), glossary_id)
+    entries = glossary["dictionaries"].get((source_lang.lower(), target_lang.lower()))
+    if entries is None:
+        return {"dictionaries": []}
+    return {"dictionaries": [{"source_lang": source_lang.lower(), "target_lang": target_lang.lower(),
+                              "entries": "\n".join(f"{s}\t{t}" for s, t in entries.items()),
+                              "entries_format": "tsv"}]}
+
+
+# Test helper: set a key's usage and limit
+@app.put("/mock/keys/{key}")
+async def set_usage(key: str, used: int = 0, limit: int = LIMIT):
+    app.state.usage[key] = [used, limit]
+    return {"key": key, "used": used, "limit": limit}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Mock DeepL API")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port)
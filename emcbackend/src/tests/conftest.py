@@ -0,0 +1,70 @@
+# Tests run against a throwaway SQLite file in place of MySQL and, where
+# DeepL is involved, against mock_deepl through an in-process transport.
+import asyncio
+import os
+
+os.environ.setdefault("DEEPL_API_URL", "http://mock-deepl")
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+import mock_deepl
+from app import db as app_db
+from app.models import Base
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # NullPool: every test body runs its own event loop, so no connection
+    # may outlive the loop that opened it
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=NullPool)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(create())
+    primary = app_db.SessionLocal.kw["bind"]
+    monkeypatch.setattr(app_db, "engine", engine)
+    app_db.SessionLocal.configure(bind=engine)
+    app_db.cache_store.clear()
+    yield engine
+    app_db.SessionLocal.configure(bind=primary)
+
+
+@pytest.fixture
+def run(engine):
+    # Runs a coroutine to completion
+    return asyncio.run
+
+
+@pytest.fixture
+def execute(engine, run):
+    # Runs raw SQL in its own transaction, like another process would
+    def execute(sql, **params):
+        async def go():
+            async with engine.begin() as conn:
+                result = await conn.execute(text(sql), params)
+                return result.fetchall() if result.returns_rows else None
+        return run(go())
+    return execute
+
+
+@pytest.fixture
+def deepl():
+    # A fresh mock DeepL server and a client that talks to it in-process
+    mock_deepl.app.state.usage = {}
+    mock_deepl.app.state.glossaries = {}
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=mock_deepl.app))
+
+
+@pytest.fixture
+def client(engine):
+    import main
+
+    with TestClient(main.app) as client:
+        yield client
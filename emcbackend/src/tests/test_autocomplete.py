@@ -0,0 +1,42 @@
+from app.autocomplete import LayerIndex
+
+
+def test_private_words_are_never_completed():
+    index = LayerIndex.load([(1, "apple", False), (2, "apricot", True), (3, "apple", None), (4, None, False)])
+    assert index.complete("ap") == ["apple"]
+    index.add(5, "april", True)
+    index.add(6, "apex", False)
+    assert index.complete("ap") == ["apex", "apple"]
+    # A word stays while any public row still has it
+    index.remove(1)
+    assert index.complete("ap") == ["apex", "apple"]
+    index.remove_many([3, 6])
+    assert index.complete("ap") == []
+
+
+def test_autocomplete_route_ignores_user_id(client):
+    response = client.post("/first_layer/", json={"pre_id": 0, "word": "secret", "meaning": "m", "is_private": True,
+                                       "who_added": 7, "who_agreed": 0, "deepl_translation": ""})
+    assert response.status_code == 200
+    response = client.post("/core_layer/", json={"word": "second", "meaning": "m", "is_private": False, "who_added": 7,
+                                      "who_agreed": 0, "deepl_translation": "", "additional_translation": ""})
+    assert response.status_code == 200
+    assert client.get("/autocomplete", params={"prefix": "se", "user_id": 7}).json() == ["second"]
+
+
+def test_rows_changed_by_another_worker_drop_out(client, execute):
+    for word in ("seal", "seed", "sell"):
+        response = client.post("/core_layer/", json={"word": word, "meaning": "m", "is_private": False,
+                                                     "who_added": 7, "who_agreed": 0, "deepl_translation": "",
+                                                     "additional_translation": ""})
+        assert response.status_code == 200
+    assert client.get("/autocomplete", params={"prefix": "se", "limit": 2}).json() == ["seal", "seed"]
+
+    # Written behind this worker's back: its index still has all three
+    execute("DELETE FROM core_layer WHERE word = 'seal'")
+    execute("UPDATE core_layer SET is_private = 1 WHERE word = 'seed'")
+    execute("INSERT INTO core_layer (word, is_private) VALUES ('sell', 0)")
+    assert client.get("/autocomplete", params={"prefix": "se", "limit": 2}).json() == ["sell"]
+    index = client.app.state.autocomplete["core"]
+    assert index.complete("se") == ["sell"]
+    assert len(index._ids["sell"]) == 2
@@ -0,0 +1,41 @@
+from app.backfill import CHECKPOINT, Backfill
+from app.keypool import KeyPool
+from app.translation_cache import TranslationCache
+
+
+def make_backfill(deepl):
+    pool = KeyPool()
+    pool.set_keys([(1, "k1")])
+    return Backfill(pool, deepl, TranslationCache())
+
+
+def add_words(execute, *words):
+    for word in words:
+        execute("INSERT INTO first_layer (word, meaning, is_private, who_added) VALUES (:word, '', 0, 1)", word=word)
+
+
+def test_only_the_lease_holder_translates(run, execute, deepl):
+    add_words(execute, "apple", "pear")
+    first, second = make_backfill(deepl), make_backfill(deepl)
+
+    assert run(first.claim())
+    stats = run(second.run(once=True))
+    assert (stats["leased"], stats["rows"]) == (False, 0)
+
+    # Releases the lease once every row is done
+    assert run(first.run(once=True))["rows"] == 2
+    assert execute("SELECT owner FROM worker_checkpoints") == [(None,)]
+
+    # The next worker resumes from the checkpoint the first one saved
+    add_words(execute, "plum")
+    assert run(second.run(once=True))["rows"] == 1
+    assert execute("SELECT word, deepl_translation FROM first_layer ORDER BY pre_id") == [
+        ("apple", "de:apple"), ("pear", "de:pear"), ("plum", "de:plum")]
+
+
+def test_expired_lease_is_taken_over(run, execute, deepl):
+    execute(f"INSERT INTO worker_checkpoints (name, position, owner, lease_until) "
+            f"VALUES ('{CHECKPOINT}', 0, 'gone', '2000-01-01 00:00:00')")
+    backfill = make_backfill(deepl)
+    assert run(backfill.claim())
+    assert execute("SELECT owner FROM worker_checkpoints") == [(backfill.owner,)]
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+import mock_deepl
+from app.batcher import TranslationBatcher
+from app.keypool import KeyPool, KeysExhausted
+
+
+def make_batcher(deepl, **kwargs):
+    pool = KeyPool()
+    pool.set_keys([(1, "k1")])
+    return TranslationBatcher(pool, deepl, **kwargs)
+
+
+def test_concurrent_calls_share_requests(deepl):
+    batcher = make_batcher(deepl)
+
+    async def go():
+        texts = [f"word{i}" for i in range(120)]
+        return await asyncio.gather(batcher.translate_many(texts, "DE"), batcher.translate("word", "FR"),
+                                    batcher.translate("word", "DE", "EN"))
+
+    german, french, from_english = asyncio.run(go())
+    assert german == [f"de:word{i}" for i in range(120)]
+    assert (french, from_english) == ("fr:word", "de:word")
+    # 50 + 50 + 20 German texts, and one request for each other language pair
+    assert batcher.stats()["requests"] == 5
+    assert batcher.stats()["texts"] == 122
+    assert batcher.in_flight == 0
+
+
+def test_batches_are_split_by_characters(deepl):
+    batcher = make_batcher(deepl, max_chars=10)
+
+    async def go():
+        return await batcher.translate_many(["aaaa", "bbbb", "cccc", "dddd"], "DE")
+
+    assert asyncio.run(go()) == ["de:aaaa", "de:bbbb", "de:cccc", "de:dddd"]
+    assert batcher.stats()["requests"] == 2
+
+
+def test_every_caller_gets_the_error(deepl):
+    batcher = make_batcher(deepl)
+    mock_deepl.app.state.usage = {"k1": [0, 5]}
+
+    async def go():
+        return await asyncio.gather(batcher.translate("apple", "DE"), batcher.translate("pear", "DE"),
+                                    return_exceptions=True)
+
+    results = asyncio.run(go())
+    assert [type(result) for result in results] == [KeysExhausted, KeysExhausted]
+    assert batcher.stats()["requests"] == 1
+    with pytest.raises(KeysExhausted):
+        asyncio.run(batcher.translate("fig", "DE"))
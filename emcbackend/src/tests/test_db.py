@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import db as app_db
+
+
+def test_connection_checked_out_only_when_queried(monkeypatch):
+    stats = app_db.PoolStats()
+    monkeypatch.setattr(app_db, "pool_stats", stats)
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=app_db.TimedQueuePool,
+                                 pool_size=1, max_overflow=0, pool_timeout=0.1)
+    maker = sessionmaker(engine, class_=AsyncSession)
+
+    async def go():
+        async for db in app_db._session(maker):
+            assert stats.checkouts == 0
+            await db.execute(text("SELECT 1"))
+            assert stats.checkouts == 1
+            async with maker() as other:
+                with pytest.raises(PoolTimeoutError):
+                    await other.execute(text("SELECT 1"))
+        await engine.dispose()
+
+    asyncio.run(go())
+    assert stats.timeouts == 1
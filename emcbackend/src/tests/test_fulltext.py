@@ -0,0 +1,50 @@
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.db import SessionLocal
+from app.fulltext import fts5_query, fulltext_search
+
+MIGRATION = Path(__file__).parent.parent / "migrations" / "001_layer_fulltext.sqlite.sql"
+
+
+@pytest.fixture
+def fts(engine, execute):
+    execute("INSERT INTO first_layer (pre_id, word, meaning, deepl_translation) VALUES "
+            "(1, 'pie', 'baked apple dish', 'Kuchen'), (2, 'apple', 'a fruit', 'Apfel'), "
+            "(3, 'pear', 'a fruit', 'Birne')")
+    # Rows inserted before the migration are picked up by its rebuild
+    with sqlite3.connect(engine.url.database) as conn:
+        conn.executescript(MIGRATION.read_text())
+
+
+def search(run, q, mode="natural"):
+    async def go():
+        async with SessionLocal() as db:
+            return await fulltext_search(db, "first_layer", q, mode, 10)
+    return [row["id"] for row in run(go())]
+
+
+def test_fts5_query():
+    assert fts5_query("apple pie", "natural") == '"apple" OR "pie"'
+    assert fts5_query("+apple -pie fruit", "boolean") == '("apple") NOT ("pie")'
+    assert fts5_query('app* "baked apple"', "boolean") == '"app"* OR "baked apple"'
+    assert fts5_query('-"" ""', "boolean") is None
+
+
+def test_word_matches_rank_first(run, fts):
+    assert search(run, "apple") == [2, 1]
+    assert search(run, "fruit") in ([2, 3], [3, 2])
+    assert search(run, "+fruit -apple", "boolean") == [3]
+    assert search(run, "ap*", "boolean") == [2, 1]
+
+
+def test_triggers_follow_writes(run, fts, execute, client):
+    execute("UPDATE first_layer SET word = 'apple tart' WHERE pre_id = 1")
+    execute("DELETE FROM first_layer WHERE pre_id = 2")
+    execute("INSERT INTO first_layer (pre_id, word, meaning) VALUES (4, 'crabapple', 'sour apple')")
+    assert search(run, "apple") == [1, 4]
+    response = client.get("/first_layer_fulltext", params={"q": "tart"})
+    assert [row["id"] for row in response.json()] == [1]
+    assert client.get("/first_layer_fulltext", params={"q": "x", "mode": "fuzzy"}).status_code == 400
@@ -0,0 +1,119 @@
+import asyncio
+
+import mock_deepl
+from app.batcher import TranslationBatcher
+from app.db import SessionLocal
+from app.glossary import Glossary, GlossarySync, translate_resolved
+from app.keypool import KeyPool
+from app.translation_cache import TranslationCache
+
+ENTRIES = {"ice cream": "Eis", "ice": "Eiswürfel", "cream": "Sahne"}
+
+
+def make_pool():
+    pool = KeyPool()
+    pool.set_keys([(1, "k1"), (2, "k2")])
+    return pool
+
+
+def glossary_with(entries):
+    glossary = Glossary("EN", "DE")
+    glossary.set_entries(entries)
+    return glossary
+
+
+def deepl_entries(key):
+    return [glossary["dictionaries"][("en", "de")] for glossary in mock_deepl.app.state.glossaries.values()
+            if glossary["key"] == key]
+
+
+def test_split_takes_the_longest_term_at_word_boundaries():
+    glossary = glossary_with(ENTRIES)
+    assert glossary.split("Ice  Cream and icecream, cream!") == [
+        ("Ice  Cream", "Eis"), (" and icecream, ", None), ("cream", "Sahne"), ("!", None)]
+    assert glossary.split("ice") == [("ice", "Eiswürfel")]
+    assert glossary.split("") == []
+    assert glossary.applies("de", "en") and not glossary.applies("FR")
+
+
+def test_translate_resolved_sends_only_unknown_stretches(run, deepl):
+    glossary = glossary_with(ENTRIES)
+    batcher = TranslationBatcher(make_pool(), deepl)
+
+    async def go():
+        async with SessionLocal() as db:
+            return await translate_resolved(db, TranslationCache(), batcher, glossary,
+                                            ["I like  ice cream.", "cream", "  "], "DE")
+
+    assert run(go()) == ["de:I like  Eis.", "Sahne", "  "]
+    stats = glossary.stats()
+    assert (stats["texts"], stats["texts_resolved"], stats["terms_resolved"]) == (3, 2, 2)
+    assert stats["chars_sent"] == len("I like")
+    assert batcher.stats()["texts"] == 1
+
+
+def test_load_skips_private_rows(run, execute):
+    execute("INSERT INTO core_layer (word, deepl_translation, additional_translation, is_private) VALUES "
+            "('apple', 'Apfel', NULL, 0), ('secret', 'Geheim', NULL, 1), ('pear', '', 'Birne', NULL), "
+            "('apple', 'Apfel 2', NULL, 0), ('tab', 'a\tb', NULL, 0)")
+    glossary = Glossary("EN", "DE")
+
+    async def go():
+        async with SessionLocal() as db:
+            await glossary.load(db)
+
+    run(go())
+    assert glossary.entries == {"apple": "Apfel", "pear": "Birne"}
+
+
+def test_sync_sends_only_the_difference(run, deepl):
+    glossary = glossary_with({"apple": "Apfel", "pear": "Birne"})
+    sync = GlossarySync(glossary, make_pool(), deepl)
+
+    run(sync.run())
+    assert (sync.leased, sync.creates, sync.version) == (True, 2, glossary.version)
+    assert deepl_entries("k1") == deepl_entries("k2") == [{"apple": "Apfel", "pear": "Birne"}]
+
+    glossary.set_entries({"apple": "Apfel", "pear": "Birne", "plum": "Pflaume"})
+    run(sync.run())
+    assert (sync.merges, sync.replaces, sync.entries_sent) == (2, 0, 6)
+
+    glossary.set_entries({"apple": "Apfel"})
+    run(sync.run())
+    assert (sync.merges, sync.replaces, sync.entries_sent) == (2, 2, 8)
+    assert deepl_entries("k1") == [{"apple": "Apfel"}]
+    assert sync.version == glossary.version
+
+    # A new process finds the glossaries and reads them before sending
+    restarted = GlossarySync(glossary, make_pool(), deepl)
+    run(sync.release())
+    run(restarted.run())
+    assert (restarted.creates, restarted.merges, restarted.replaces) == (0, 0, 0)
+    assert len(mock_deepl.app.state.glossaries) == 2
+
+
+def test_only_the_lease_holder_writes(run, deepl):
+    glossary = glossary_with({"apple": "Apfel"})
+    first = GlossarySync(glossary, make_pool(), deepl)
+    second = GlossarySync(glossary, make_pool(), deepl)
+
+    async def together():
+        await asyncio.gather(first.run(), second.run())
+
+    run(together())
+    assert sorted([first.leased, second.leased]) == [False, True]
+    assert first.creates + second.creates == 2
+    assert len(mock_deepl.app.state.glossaries) == 2
+    # The follower knows the ids and the version without writing, at the
+    # latest on its next round
+    follower = second if first.leased else first
+    run(follower.run())
+    assert follower.version == glossary.version
+    assert sorted(state.id for state in follower.pool.active() if follower.name in state.glossaries) == [1, 2]
+
+    # The version is what DeepL holds, not what this worker loaded
+    synced = glossary.version
+    glossary.set_entries({"apple": "Apfel", "pear": "Birne"})
+    run(follower.run())
+    assert follower.version == synced
+    assert first.creates + second.creates + first.merges + second.merges == 2
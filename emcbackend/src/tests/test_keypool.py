@@ -0,0 +1,51 @@
+import pytest
+
+import mock_deepl
+from app.keypool import KeyPool, KeysExhausted, sync_key_pool
+
+
+def keys(execute):
+    return execute("SELECT id, accessible FROM deepl_keys ORDER BY id")
+
+
+def test_exhausted_keys_come_back_and_revoked_keys_are_retired(run, execute, deepl):
+    execute("INSERT INTO deepl_keys (id, key, accessible) VALUES (1, 'k1', 1), (2, 'k2', 1), (3, 'invalid3', 1)")
+    mock_deepl.app.state.usage = {"k1": [100, 100], "k2": [10, 100]}
+    pool = KeyPool()
+
+    run(sync_key_pool(pool, deepl))
+    assert [state.id for state in pool.active()] == [2]
+    assert pool.stats()["exhausted"] == [1]
+    assert keys(execute) == [(1, 1), (2, 1), (3, 0)]
+
+    # k2 has no room for the request, then k1's quota is reset
+    with pytest.raises(KeysExhausted):
+        run(pool.translate(deepl, ["x" * 95], "DE"))
+    mock_deepl.app.state.usage["k1"] = [0, 100]
+
+    run(sync_key_pool(pool, deepl))
+    assert [state.id for state in pool.active()] == [1, 2]
+    assert run(pool.translate(deepl, ["x" * 95], "DE")) == ["de:" + "x" * 95]
+    assert keys(execute) == [(1, 1), (2, 1), (3, 0)]
+
+
+def test_quota_exceeded_mid_request_only_parks_the_key(run, execute, deepl):
+    execute("INSERT INTO deepl_keys (id, key, accessible) VALUES (1, 'k1', 1), (2, 'k2', 1)")
+    pool = KeyPool()
+    pool.set_keys([(1, "k1"), (2, "k2")])
+    # Usage not refreshed yet, so the pool picks k1 although it is spent
+    mock_deepl.app.state.usage = {"k1": [100, 100], "k2": [0, 100]}
+
+    assert run(pool.translate(deepl, ["hello"], "DE")) == ["de:hello"]
+    assert pool.stats()["exhausted"] == [1]
+    run(sync_key_pool(pool, deepl))
+    assert keys(execute) == [(1, 1), (2, 1)]
+
+
+def test_key_rejected_mid_request_is_revoked(run, deepl):
+    pool = KeyPool()
+    pool.set_keys([(1, "invalid1"), (2, "k2")])
+
+    assert run(pool.translate(deepl, ["hello"], "DE")) == ["de:hello"]
+    assert pool.stats()["revoked"] == [1]
+    assert [state.id for state in pool.active()] == [2]
@@ -0,0 +1,58 @@
+from app.db import SessionLocal
+from app.ngram import NgramIndex, build_indexes, infix_search
+
+
+def search(run, indexes, name, keyword):
+    async def go():
+        async with SessionLocal() as db:
+            return await infix_search(db, name, indexes[name], keyword)
+    return run(go())
+
+
+def build(run):
+    async def go():
+        async with SessionLocal() as db:
+            return await build_indexes(db)
+    return run(go())
+
+
+def test_candidates_need_every_trigram():
+    index = NgramIndex()
+    index.add(1, "Apple pie", None)
+    index.add(2, "pineapple", "fruit")
+    index.add(3, "grape")
+    assert index.candidates("apple") == {1, 2}
+    assert index.candidates("ap") is None
+    index.remove(2)
+    assert index.candidates("apple") == {1}
+
+
+def test_search_rechecks_and_sees_other_writers(run, execute):
+    execute("INSERT INTO core_layer (id, word, meaning) VALUES "
+            "(1, 'apple', 'fruit'), (2, 'grape', 'app ppl ple'), (3, 'melon', 'sweet')")
+    indexes = build(run)
+    # grape has every trigram of "apple" but not the substring
+    assert indexes["core_layer"].candidates("apple") == {1, 2}
+    assert [row.word for row in search(run, indexes, "core_layer", "apple")] == ["apple"]
+
+    # Written by another process: inserts are found by the tail scan,
+    # deletes and edits are caught by the re-check
+    execute("INSERT INTO core_layer (id, word, meaning) VALUES (4, 'Pineapple', 'fruit'), (5, 'plum', '100%ppl')")
+    execute("DELETE FROM core_layer WHERE id = 1")
+    assert [row.word for row in search(run, indexes, "core_layer", "PPL")] == ["grape", "Pineapple", "plum"]
+    assert [row.word for row in search(run, indexes, "core_layer", "0%p")] == ["plum"]
+    assert search(run, indexes, "core_layer", "0_p") == []
+
+    # An edit that makes an old row match shows up after the next rebuild
+    execute("UPDATE core_layer SET meaning = 'an apple' WHERE id = 3")
+    assert [row.word for row in search(run, indexes, "core_layer", "apple")] == ["Pineapple"]
+    indexes = build(run)
+    assert [row.word for row in search(run, indexes, "core_layer", "apple")] == ["melon", "Pineapple"]
+
+
+
+def test_search_route_sees_rows_added_after_startup(client, execute):
+    # The index built at startup is empty, so these come from the tail scan
+    execute("INSERT INTO first_layer (pre_id, word, meaning) VALUES (1, 'apple', 'fruit'), (2, 'pear', 'fruit')")
+    assert client.get("/first_layer_search", params={"keyword": "appl"}).json() == ["apple"]
+    assert client.get("/first_layer_search", params={"keyword": "fruit"}).json() == ["apple", "pear"]
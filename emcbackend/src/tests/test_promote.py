@@ -0,0 +1,24 @@
+from app.db import SessionLocal
+from app.models import FirstLayerCreate
+from app.promote import promote
+
+
+def test_only_rows_someone_agreed_to_are_promoted(run, execute):
+    for pre_id, word, who_agreed in [(1, "apple", 7), (2, "pear", None), (3, "plum", 0), (4, "fig", 3)]:
+        execute("INSERT INTO first_layer (pre_id, word, is_private, who_added, who_agreed) "
+                "VALUES (:pre_id, :word, 0, 1, :who_agreed)", pre_id=pre_id, word=word, who_agreed=who_agreed)
+
+    async def go(dry_run):
+        async with SessionLocal() as db:
+            return await promote(db, chunk_size=1, dry_run=dry_run)
+
+    assert run(go(True))["rows"] == 2
+    assert run(go(False))["rows"] == 2
+    assert execute("SELECT word, who_agreed FROM core_layer ORDER BY id") == [("apple", 7), ("fig", 3)]
+    assert execute("SELECT pre_id FROM first_layer ORDER BY pre_id") == [(2,), (3,)]
+
+
+def test_new_records_start_unapproved():
+    record = FirstLayerCreate(pre_id=0, word="apple", meaning="fruit", is_private=False, who_added=1,
+                              deepl_translation="Apfel")
+    assert record.who_agreed is None
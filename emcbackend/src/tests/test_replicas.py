@@ -0,0 +1,49 @@
+import asyncio
+import itertools
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import main
+from app import db as app_db
+from app.models import Base, User
+
+
+@pytest.fixture
+def replica(tmp_path, monkeypatch, engine):
+    # A second database standing in for a replica that has not caught up
+    replica = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'replica.db'}", poolclass=NullPool)
+
+    async def create():
+        async with replica.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.execute(User.__table__.insert().values(id=1, username="on-replica"))
+
+    asyncio.run(create())
+    sessions = [sessionmaker(replica, expire_on_commit=False, class_=AsyncSession)]
+    monkeypatch.setattr(app_db, "ReplicaSessions", sessions)
+    monkeypatch.setattr(app_db, "_replica_cycle", itertools.cycle(sessions))
+    monkeypatch.setattr(main, "replica_engines", [replica])
+    return replica
+
+
+def usernames(response):
+    assert response.status_code == 200
+    return [user["username"] for user in response.json()]
+
+
+def test_reads_go_to_replicas_until_the_client_writes(replica, execute, client):
+    execute("INSERT INTO users (id, username) VALUES (1, 'on-primary')")
+    assert usernames(client.get("/users/")) == ["on-replica"]
+    assert usernames(client.get("/users/", headers={app_db.READ_PRIMARY_HEADER: "1"})) == ["on-primary"]
+
+    response = client.request("DELETE", "/users/bulk", json=[5])
+    assert response.cookies.get(app_db.READ_PRIMARY_COOKIE) == "1"
+    assert usernames(client.get("/users/")) == ["on-primary"]
+
+    # Failed writes do not pin the client
+    client.cookies.clear()
+    assert client.put("/users/1", json={"username": None}).status_code == 422
+    assert usernames(client.get("/users/")) == ["on-replica"]
@@ -0,0 +1,101 @@
+from app.batcher import TranslationBatcher
+from app.db import SessionLocal
+from app.keypool import KeyPool
+from app.translation_cache import TranslationCache, cache_key, cache_rows, normalise_source, translate_cached
+
+
+def make_batcher(deepl):
+    pool = KeyPool()
+    pool.set_keys([(1, "k1")])
+    return TranslationBatcher(pool, deepl)
+
+
+def rows(cache_hits, target_lang="DE"):
+    pending = {cache_key(text, None, target_lang, None): normalise_source(text) for text in cache_hits}
+    return cache_rows(pending, list(cache_hits.values()), target_lang)
+
+
+def test_cache_key_normalisation():
+    assert normalise_source("  ﬁne  day\n") == "fine day"
+    assert cache_key("ﬁne  day", "en", "de", None) == cache_key("fine day", "EN", "DE", "")
+    # Case and accents can change a translation
+    assert cache_key("Fine", None, "DE", None) != cache_key("fine", None, "DE", None)
+    assert cache_key("café", None, "DE", None) != cache_key("cafe", None, "DE", None)
+    # The language pair and the glossary are part of the key
+    assert cache_key("fine", None, "DE", None) != cache_key("fine", "EN", "DE", None)
+    assert cache_key("fine", None, "DE", None) != cache_key("fine", None, "FR", None)
+    assert cache_key("fine", None, "DE", None) != cache_key("fine", None, "DE", "g1")
+    assert cache_key("fine", None, "DE", "g1") != cache_key("fine", None, "DE", "g2")
+
+
+def test_memory_tier_evicts_least_recently_used(run):
+    cache = TranslationCache(size=2)
+    apple, pear, plum = (cache_key(word, None, "DE", None) for word in ("apple", "pear", "plum"))
+
+    async def go():
+        async with SessionLocal() as db:
+            await cache.put_many(db, rows({"apple": "Apfel", "pear": "Birne"}))
+            assert await cache.get_many(db, [apple]) == {apple: "Apfel"}
+            await cache.put_many(db, rows({"plum": "Pflaume"}))
+            # pear was used least recently
+            assert list(cache._memory) == [apple, plum]
+            # and comes back from the table
+            return await cache.get_many(db, [pear])
+
+    assert run(go()) == {pear: "Birne"}
+    assert list(cache._memory) == [plum, pear]
+    assert cache._memory.evictions == 2
+    assert (cache.memory_hits, cache.table_hits, cache.misses) == (1, 1, 0)
+
+
+def test_reads_through_to_the_table(run):
+    apple = cache_key("apple", None, "DE", None)
+
+    async def put():
+        async with SessionLocal() as db:
+            await TranslationCache().put_many(db, rows({"apple": "Apfel"}))
+            await db.commit()
+
+    async def get(cache):
+        async with SessionLocal() as db:
+            return await cache.get_many(db, [apple])
+
+    run(put())
+    # Another worker's cache finds the row and keeps it in memory
+    cache = TranslationCache()
+    assert run(get(cache)) == {apple: "Apfel"}
+    assert run(get(cache)) == {apple: "Apfel"}
+    assert (cache.table_hits, cache.memory_hits) == (1, 1)
+
+
+def test_concurrent_inserts_keep_the_first_row(run, execute):
+    async def put(cache, translation):
+        async with SessionLocal() as db:
+            await cache.put_many(db, rows({"apple": translation}))
+            await db.commit()
+
+    run(put(TranslationCache(), "Apfel"))
+    run(put(TranslationCache(), "Apfel (2)"))
+    assert execute("SELECT source_text, translation FROM translations") == [("apple", "Apfel")]
+
+
+def test_translate_cached_sends_each_new_text_once(run, deepl, execute):
+    cache = TranslationCache()
+    batcher = make_batcher(deepl)
+
+    async def go(texts, **kwargs):
+        async with SessionLocal() as db:
+            return await translate_cached(db, cache, batcher, texts, "DE", **kwargs)
+
+    assert run(go(["apple", " apple ", "pear"])) == ["de:apple", "de:apple", "de:pear"]
+    assert batcher.stats()["texts"] == 2
+    assert run(go(["pear", "plum"])) == ["de:pear", "de:plum"]
+    assert batcher.stats()["texts"] == 3
+    assert execute("SELECT source_text, glossary_id FROM translations ORDER BY source_text") == [
+        ("apple", ""), ("pear", ""), ("plum", "")]
+
+    # A synced glossary's translations are keyed by its name and version
+    key = cache_key("plum", "EN", "DE", "core:v1")
+    cache._memory[key] = "Pflaume"
+    assert run(go(["plum"], source_lang="EN", glossary="core", glossary_version="v1")) == ["Pflaume"]
+    assert batcher.stats()["texts"] == 3
@@ -0,0 +1,60 @@
+from app.user_words import parse_words
+
+
+def new_user(username, liked_words="", to_learn=""):
+    return {"username": username, "password": "pw", "is_admin": False, "is_super_admin": False, "added_by": 1,
+            "liked_words": liked_words, "to_learn": to_learn}
+
+
+def search(client, keyword):
+    response = client.get("/users_search", params={"keyword": keyword})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_parse_words():
+    assert parse_words(" apple, pear,,apple ,") == ["apple", "pear"]
+    assert parse_words(None) == []
+
+
+def test_search_reads_the_word_lists(client, execute):
+    alice = client.post("/users/", json=new_user("alice", "apple, pear")).json()["id"]
+    bob = client.post("/users/bulk", json=[new_user("bob", to_learn="grape")]).json()["ids"][0]
+    assert client.get(f"/users/{alice}/liked_words").json()[0]["word"] == "apple"
+    assert search(client, "apple") == ["alice"]
+    assert search(client, "rap") == ["bob"]
+
+    client.post(f"/users/{bob}/liked_words", json=["pineapple"])
+    assert search(client, "apple") == ["alice", "bob"]
+    assert search(client, "ne") == ["bob"]
+
+    # A PUT replaces a list only when it sends it
+    client.put(f"/users/{alice}", json=new_user("alice", "plum"))
+    assert [row["word"] for row in client.get(f"/users/{alice}/liked_words").json()] == ["plum"]
+    assert search(client, "apple") == ["bob"]
+
+    # Words another process adds are found too
+    execute("INSERT INTO users (id, username) VALUES (50, 'carol')")
+    execute("INSERT INTO user_words (user_id, kind, word) VALUES (50, 'to_learn', 'crabapple')")
+    assert search(client, "apple") == ["bob", "carol"]
+    assert search(client, "car") == ["carol"]
+
+
+def test_get_then_put_keeps_the_lists(client):
+    # Round-tripping the user, e.g. to change the password, must not undo
+    # words added through the list endpoints
+    user_id = client.post("/users/", json=new_user("dana", "apple")).json()["id"]
+    client.post(f"/users/{user_id}/liked_words", json=["pear", "plum"])
+    user = client.get(f"/users/{user_id}").json()
+    assert "liked_words" not in user and "to_learn" not in user
+    user.pop("id")
+    client.put(f"/users/{user_id}", json={**user, "password": "new"})
+    assert [row["word"] for row in client.get(f"/users/{user_id}/liked_words").json()] == ["apple", "pear", "plum"]
+    assert client.get(f"/users/{user_id}").json()["password"] == "new"
+    assert "liked_words" not in client.get("/users/").json()[0]
+
+    # Sending one list leaves the other alone
+    user = {key: value for key, value in new_user("dana", to_learn="fig").items() if key != "liked_words"}
+    client.put(f"/users/{user_id}", json=user)
+    assert [row["word"] for row in client.get(f"/users/{user_id}/liked_words").json()] == ["apple", "pear", "plum"]
+    assert [row["word"] for row in client.get(f"/users/{user_id}/to_learn").json()] == ["fig"]
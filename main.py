@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from app.routes import router
-from app.models import Dictionary
-from app.trie import Trie
+from app.snapshot import load_trie
+from app.sync import follow_changes
 from app.db import get_db2
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import uvicorn
 
 app = FastAPI()
@@ -12,19 +14,20 @@ app.include_router(router)
 
 @app.on_event("startup")
 async def startup_event():
-    # Retrieve all words from the database
-    words = get_db2().query(Dictionary.word).all()
-
-    # Create a new trie
-    trie = Trie()
-
-    # Insert each word into the trie
-    for word in words:
-        trie.insert(word)
+    # Open the on-disk snapshot, rebuilding it only if the dictionary
+    # table changed; runs in a thread so the event loop is not blocked
+    db = get_db2()
+    try:
+        trie, seq = await run_in_threadpool(load_trie, db)
+    finally:
+        db.close()
 
     # Save the trie to a global variable
     app.state.trie = trie
 
+    # Keep applying dictionary writes made through other workers
+    app.state.trie_sync = asyncio.create_task(follow_changes(app, seq))
+
 if __name__ == "__main__":
     origins = [
         "http://localhost",
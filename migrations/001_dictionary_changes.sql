@@ -0,0 +1,8 @@
+-- Change feed for the dictionary table. Every write through the API appends
+-- one row per word; workers poll it by seq to keep their tries in sync.
+CREATE TABLE IF NOT EXISTS dictionary_changes (
+    seq BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    op VARCHAR(6) NOT NULL,
+    word VARCHAR(50) NOT NULL,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+);
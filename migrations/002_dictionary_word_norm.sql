@@ -0,0 +1,5 @@
+-- Normalised lookup key for dictionary words (see app/normalize.py). Fill
+-- existing rows afterwards with: python -m migrations.backfill_word_norm
+ALTER TABLE dictionary
+    ADD COLUMN word_norm VARCHAR(50) NULL AFTER word,
+    ADD INDEX ix_dictionary_word_norm (word_norm);
@@ -0,0 +1,32 @@
+# Fills dictionary.word_norm for rows written before the column existed.
+# Accent folding is not expressible in SQL, so this runs in Python. Run from
+# the repository root: python -m migrations.backfill_word_norm
+from sqlalchemy import bindparam, update
+
+from app.db import SessionLocal
+from app.models import Dictionary
+from app.normalize import normalize
+
+BATCH_SIZE = 1000
+
+
+def main():
+    db = SessionLocal()
+    try:
+        rows = db.query(Dictionary.id, Dictionary.word).filter(Dictionary.word_norm.is_(None)).all()
+        query = (
+            update(Dictionary.__table__)
+            .where(Dictionary.__table__.c.id == bindparam("row_id"))
+            .values(word_norm=bindparam("norm"))
+        )
+        for start in range(0, len(rows), BATCH_SIZE):
+            batch = rows[start:start + BATCH_SIZE]
+            db.execute(query, [{"row_id": row_id, "norm": normalize(word)} for row_id, word in batch if word])
+            db.commit()
+        print(f"backfilled {len(rows)} rows")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+
+from app import db as app_db
+from app.models import Base
+
+
+@pytest.fixture
+def session_factory():
+    # SessionLocal rebound to a fresh in-memory SQLite database
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    app_db.SessionLocal.configure(bind=engine)
+    yield app_db.SessionLocal
+    app_db.SessionLocal.configure(bind=app_db.engine)
+    engine.dispose()
@@ -0,0 +1,49 @@
+from types import SimpleNamespace
+
+from sqlalchemy import text
+
+from app import routes
+from app.models import Dictionary, DictionaryChange, User
+from app.trie import Trie
+
+
+def use_nocase(db):
+    # Stand-in for MySQL's case-insensitive collations: SQLite compares
+    # these columns with NOCASE, IN included
+    db.execute(text("DROP TABLE dictionary"))
+    db.execute(text("CREATE TABLE dictionary (id INTEGER PRIMARY KEY, word VARCHAR(50) COLLATE NOCASE UNIQUE, "
+                    "word_norm VARCHAR(50), description TEXT)"))
+    db.execute(text("DROP TABLE users"))
+    db.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, username VARCHAR(50) COLLATE NOCASE UNIQUE, "
+                    "password VARCHAR(128), name VARCHAR(50), savedwords VARCHAR(500), timestamp DATETIME)"))
+
+
+def test_delete_dictionary_reports_stored_words(session_factory):
+    db = session_factory()
+    use_nocase(db)
+    db.add_all([Dictionary(id=1, word="Apple", word_norm="apple"), Dictionary(id=2, word="pear", word_norm="pear")])
+    db.commit()
+    trie = Trie.build(["Apple", "pear"])
+    request = SimpleNamespace(app=SimpleNamespace(state=SimpleNamespace(trie=trie)))
+
+    result = routes.delete_word(["apple", "plum"], request, db)
+
+    assert result["deleted_words"] == ["Apple"]
+    assert result["missing_words"] == ["plum"]
+    assert [(change.op, change.word) for change in db.query(DictionaryChange)] == [("delete", "Apple")]
+    assert trie.complete("a") == []
+    assert [word for (word,) in db.query(Dictionary.word)] == ["pear"]
+    db.close()
+
+
+def test_delete_users_reports_stored_names(session_factory):
+    db = session_factory()
+    use_nocase(db)
+    db.add_all([User(id=1, username="Alice"), User(id=2, username="bob")])
+    db.commit()
+
+    result = routes.delete_users(["ALICE", "carol"], db)
+
+    assert result == {"deleted_users": ["Alice"], "missing_users": ["carol"]}
+    assert [name for (name,) in db.query(User.username)] == ["bob"]
+    db.close()
@@ -0,0 +1,43 @@
+from app import snapshot
+from app.models import Dictionary
+from app.trie import Trie
+
+
+def add_words(session_factory, *words):
+    db = session_factory()
+    db.add_all([Dictionary(word=word) for word in words])
+    db.commit()
+    db.close()
+
+
+def test_stale_snapshot_is_unmapped_before_the_rebuild(session_factory, tmp_path, monkeypatch):
+    path = tmp_path / "trie.snapshot"
+    add_words(session_factory, "apple", "pear")
+    fingerprints = iter(["a", "a", "b"])
+    monkeypatch.setattr(snapshot, "dictionary_fingerprint", lambda db: next(fingerprints))
+    closed, close = [], Trie.close
+    monkeypatch.setattr(Trie, "close", lambda self: closed.append(self) or close(self))
+
+    db = session_factory()
+    first, _ = snapshot.load_trie(db, path)
+    assert snapshot.load_trie(db, path)[0].complete("") == ["pear", "apple"]
+    assert closed == []
+
+    add_words(session_factory, "plum")
+    trie, _ = snapshot.load_trie(db, path)
+    db.close()
+    assert len(closed) == 1 and closed[0]._mmap is None
+    assert trie.complete("") == ["pear", "plum", "apple"]
+    assert first.complete("") == ["pear", "apple"]
+
+
+def test_no_fingerprint_outside_mysql(session_factory, tmp_path):
+    # SQLite has no CRC32(), so the snapshot is rebuilt on every start
+    path = tmp_path / "trie.snapshot"
+    add_words(session_factory, "apple")
+    db = session_factory()
+    assert snapshot.dictionary_fingerprint(db) is None
+    assert snapshot.load_trie(db, path)[0].complete("") == ["apple"]
+    add_words(session_factory, "pear")
+    assert snapshot.load_trie(db, path)[0].complete("") == ["pear", "apple"]
+    db.close()
@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+
+from app import sync
+from app.models import DictionaryChange
+from app.trie import Trie
+
+
+def add_changes(session_factory, *changes):
+    db = session_factory()
+    db.add_all([DictionaryChange(seq=seq, op=op, word=word) for seq, op, word in changes])
+    db.commit()
+    db.close()
+
+
+def test_late_commit_below_the_cursor_is_applied(session_factory):
+    add_changes(session_factory, (1, "insert", "apple"), (3, "insert", "cherry"))
+    gaps = {}
+    changes = sync.fetch_changes(0, list(gaps))
+    seq = sync.advance(0, gaps, changes, now=0.0)
+    assert (seq, gaps) == (3, {2: 0.0})
+
+    # seq 2 commits after seq 3 was read
+    add_changes(session_factory, (2, "insert", "banana"), (4, "delete", "apple"))
+    changes = sync.fetch_changes(seq, list(gaps))
+    assert [change.seq for change in changes] == [2, 4]
+    seq = sync.advance(seq, gaps, changes, now=1.0)
+    assert (seq, gaps) == (4, {})
+
+
+def test_missing_seqs_before_the_startup_cursor(session_factory):
+    add_changes(session_factory, (1, "insert", "a"), (2, "insert", "b"), (5, "insert", "e"))
+    assert sync.missing_seqs(5) == [3, 4]
+    assert sync.missing_seqs(0) == []
+
+
+def test_follow_changes_fills_gaps(session_factory, monkeypatch):
+    monkeypatch.setattr(sync, "POLL_INTERVAL", 0.01)
+    add_changes(session_factory, (1, "insert", "apple"), (3, "insert", "cherry"))
+    app = SimpleNamespace(state=SimpleNamespace(trie=Trie()))
+
+    async def run():
+        task = asyncio.create_task(sync.follow_changes(app, 0))
+        await asyncio.sleep(0.1)
+        add_changes(session_factory, (2, "insert", "banana"))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+    assert list(app.state.trie.iter_prefix("")) == ["apple", "banana", "cherry"]
+
+
+def test_gaps_expire(session_factory, monkeypatch):
+    monkeypatch.setattr(sync, "POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(sync, "GAP_TIMEOUT", 0.0)
+    fetched = []
+    real_fetch = sync.fetch_changes
+
+    def fetch(after, missing=()):
+        fetched.append(list(missing))
+        return real_fetch(after, missing)
+
+    monkeypatch.setattr(sync, "fetch_changes", fetch)
+    add_changes(session_factory, (1, "insert", "apple"), (3, "insert", "cherry"))
+    app = SimpleNamespace(state=SimpleNamespace(trie=Trie()))
+
+    async def run():
+        task = asyncio.create_task(sync.follow_changes(app, 0))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run())
+    # The rolled-back seq 2 is asked for at most once before it expires
+    assert sum(2 in missing for missing in fetched) <= 1
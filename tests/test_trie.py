@@ -0,0 +1,233 @@
+# Randomized comparisons of the trie against straightforward reference
+# implementations over a small alphabet, so words share prefixes, differ by
+# one edit and collide under normalize().
+import random
+
+import pytest
+
+from app.normalize import normalize
+from app.trie import Trie
+
+ALPHABET = "abcdAÉéü"
+
+
+def random_word(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(1, 6)))
+
+
+class Reference:
+    # key -> spellings and key -> score, kept the way Trie documents them
+    def __init__(self):
+        self.forms = {}
+        self.scores = {}
+
+    def insert(self, word, score=0):
+        key = normalize(word)
+        self.forms.setdefault(key, set()).add(word)
+        self.scores[key] = score
+
+    def delete(self, word):
+        key = normalize(word)
+        if word not in self.forms.get(key, ()):
+            return False
+        self.forms[key].discard(word)
+        if not self.forms[key]:
+            del self.forms[key]
+            del self.scores[key]
+        return True
+
+    def words(self):
+        return [form for key in sorted(self.forms) for form in sorted(self.forms[key])]
+
+    def _expand(self, keys, k):
+        return [form for key in keys for form in sorted(self.forms[key])][:k]
+
+    def complete(self, prefix, k):
+        prefix = normalize(prefix)
+        keys = sorted((key for key in self.forms if key.startswith(prefix)),
+                      key=lambda key: (-self.scores[key], len(key), key))
+        return self._expand(keys[:k], k)
+
+    def iter_prefix(self, prefix, after=None):
+        prefix = normalize(prefix)
+        after_key = None if after is None else normalize(after)
+        return [form for key in sorted(self.forms) if key.startswith(prefix)
+                for form in sorted(self.forms[key])
+                if after is None or key > after_key or (key == after_key and form > after)]
+
+    def fuzzy(self, word, max_distance, k):
+        word = normalize(word)
+        ranked = sorted((osa_distance(word, key), -self.scores[key], len(key), key) for key in self.forms)
+        keys = [key for distance, _, _, key in ranked if distance <= max_distance]
+        return self._expand(keys[:k], k)
+
+
+def osa_distance(a, b):
+    # Levenshtein distance plus transpositions of adjacent characters
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+def assert_same(trie, ref, rng, queries=30):
+    assert len(trie) == len(ref.forms)
+    assert list(trie.iter_prefix("")) == ref.words()
+    for _ in range(queries):
+        prefix = random_word(rng)[:rng.randint(0, 3)]
+        k = rng.randint(1, 8)
+        assert trie.complete(prefix, k) == ref.complete(prefix, k)
+        assert list(trie.iter_prefix(prefix)) == ref.iter_prefix(prefix)
+        after = random_word(rng)
+        assert list(trie.iter_prefix(prefix, after)) == ref.iter_prefix(prefix, after)
+        word = random_word(rng)
+        assert trie.search(word) == (normalize(word) in ref.forms)
+        distance = rng.randint(0, 2)
+        assert trie.fuzzy(word, distance, k) == ref.fuzzy(word, distance, k)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_build_matches_reference(seed):
+    rng = random.Random(seed)
+    words = {random_word(rng) for _ in range(rng.randint(0, 200))}
+    scores = {word: rng.randint(0, 5) for word in words}
+    ref = Reference()
+    for word in words:
+        key = normalize(word)
+        ref.insert(word, max(scores[form] for form in words if normalize(form) == key))
+    assert_same(Trie.build(words, scores), ref, rng)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_insert_and_delete_match_reference(seed):
+    rng = random.Random(seed)
+    trie, ref = Trie(), Reference()
+    for step in range(400):
+        word = random_word(rng)
+        if rng.random() < 0.6:
+            score = rng.randint(0, 5)
+            trie.insert(word, score)
+            ref.insert(word, score)
+        elif rng.random() < 0.5 and ref.forms:
+            # Delete a word that is present, so pruning actually happens
+            word = rng.choice(ref.words())
+            assert trie.delete(word) == ref.delete(word) == True
+        else:
+            assert trie.delete(word) == ref.delete(word)
+        if step % 50 == 0:
+            assert_same(trie, ref, rng, queries=5)
+    assert_same(trie, ref, rng)
+
+
+def test_delete_many_returns_present_words():
+    trie = Trie.build(["apple", "Äpfel", "apfel", "banana"])
+    assert trie.delete_many(["apple", "cherry", "Äpfel", "apple"]) == ["apple", "Äpfel"]
+    assert list(trie.iter_prefix("")) == ["apfel", "banana"]
+
+
+def test_pruned_nodes_are_reused():
+    rng = random.Random(0)
+    trie = Trie()
+    words = {random_word(rng) for _ in range(300)}
+    for word in words:
+        trie.insert(word)
+    size = len(trie._label)
+    for _ in range(3):
+        for word in words:
+            assert trie.delete(word)
+        # Only the root is left in use, every other slot is on the free list
+        assert len(trie) == 0
+        assert len(trie._label) - len(trie._free) == 1
+        for word in words:
+            trie.insert(word)
+        assert len(trie._label) == size
+
+
+def test_surface_forms_share_a_key():
+    trie = Trie()
+    for word in ("Über", "uber", "über"):
+        trie.insert(word)
+    assert trie.complete("UB") == ["uber", "Über", "über"]
+    assert list(trie.iter_prefix("ub", after="uber")) == ["Über", "über"]
+    assert trie.fuzzy("ubre", 1) == ["uber", "Über", "über"]
+    trie.delete("uber")
+    trie.delete("über")
+    assert trie.complete("ub") == ["Über"]
+    assert trie.search("uber")
+    trie.delete("Über")
+    assert not trie.search("uber")
+    assert trie._surfaces == {}
+
+
+def test_iter_prefix_pages_by_cursor():
+    rng = random.Random(1)
+    words = {random_word(rng) for _ in range(300)}
+    trie = Trie.build(words)
+    expected = list(trie.iter_prefix("a"))
+    pages, after = [], ""
+    while True:
+        page = [word for _, word in zip(range(7), trie.iter_prefix("a", after))]
+        if not page:
+            break
+        pages.extend(page)
+        after = page[-1]
+    assert pages == expected
+
+
+def test_deep_words_do_not_recurse():
+    word = "a" * 5000
+    trie = Trie.build([word, word[:-1] + "b"])
+    assert list(trie.iter_prefix("a" * 4000)) == [word, word[:-1] + "b"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_snapshot_round_trip_and_copy_on_write(tmp_path, seed):
+    rng = random.Random(seed)
+    words = {random_word(rng) for _ in range(200)}
+    scores = {word: rng.randint(0, 5) for word in words}
+    path = tmp_path / "trie.snapshot"
+    built = Trie.build(words, scores)
+    built.save(path, {"fingerprint": "x"})
+
+    trie, meta = Trie.open(path)
+    assert meta == {"fingerprint": "x"}
+    assert trie._mmap is not None
+    for prefix in ("", "a", "é", "É", "ab"):
+        assert trie.complete(prefix, 20) == built.complete(prefix, 20)
+        assert list(trie.iter_prefix(prefix)) == list(built.iter_prefix(prefix))
+
+    # The first write copies the arrays; the file itself is left untouched
+    before = path.read_bytes()
+    ref = Reference()
+    for word in words:
+        ref.insert(word)
+    for word in rng.sample(sorted(words), 50):
+        trie.delete(word)
+        ref.delete(word)
+    for _ in range(50):
+        word = random_word(rng)
+        trie.insert(word)
+        ref.insert(word)
+    assert trie._mmap is None
+    assert list(trie.iter_prefix("")) == ref.words()
+    assert path.read_bytes() == before
+    assert list(Trie.open(path)[0].iter_prefix("")) == list(built.iter_prefix(""))
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / "not-a-trie"
+    path.write_bytes(b"hello world, this is not a snapshot at all")
+    with pytest.raises(ValueError):
+        Trie.open(path)
+    Trie.build(["a", "b"]).save(path)
+    path.write_bytes(path.read_bytes()[:60])
+    with pytest.raises(ValueError):
+        Trie.open(path)